@@ -1,6 +1,11 @@
-from typing import Dict, Any, List
+import asyncio
+from typing import Callable, Dict, Any, List, Optional
 from app.core.a2a_models import TaskInput, TaskResult, AgentCard
-from app.core.gemini import generate_text
+from app.core.gemini import DEFAULT_MODEL, generate_text, generate_text_async, is_fallback
+from app.core.metrics import METRICS
+from app.agents.rules import get_ruleset
+from app.agents import fingerprint, tiering
+from app.agents.prompting import condense_logs
 
 
 def get_agent_card() -> AgentCard:
@@ -13,50 +18,104 @@ def get_agent_card() -> AgentCard:
 
 
 def _rule_based_parse(logs: str) -> List[Dict[str, Any]]:
-    issues: List[Dict[str, Any]] = []
-    lowered = logs.lower()
-    if "rtsp" in lowered and ("drop" in lowered or "reconnect" in lowered):
-        issues.append({
-            "component": "stream",
-            "finding": "RTSP instability (drops/reconnects)",
-            "confidence": 0.7,
-            "evidence": "rtsp + drops/reconnect in logs",
-        })
-    if "timeout" in lowered or "ping" in lowered or "%" in lowered:
-        # try to extract packet loss percentage
-        import re
-        m = re.search(r"(\d+)%", logs)
-        loss = int(m.group(1)) if m else None
-        issues.append({
-            "component": "network",
-            "finding": "Intermittent connectivity / packet loss",
-            "confidence": 0.75 if loss and loss >= 30 else 0.6,
-            "evidence": f"timeout/ping loss{f' {loss}%' if loss is not None else ''}",
-            "packet_loss_percent": loss,
-        })
-    if "firmware" in lowered and ("latest" in lowered or "version" in lowered):
-        issues.append({
-            "component": "firmware",
-            "finding": "Outdated firmware",
-            "confidence": 0.8,
-            "evidence": "version older than latest",
-        })
-    return issues
-
-
-def run(input_data: TaskInput) -> TaskResult:
-    issues = _rule_based_parse(input_data.logs)
-    system = (
-        "You are a diagnostics expert for IP cameras (home/office/street). "
-        "Given logs, summarize likely root causes, affected components, and confidence based on the evidence. "
-        "Output concise bullet points."
+    return get_ruleset().parse(logs)
+
+
+def _rules_summary(issues: List[Dict[str, Any]]) -> str:
+    return "\n".join(
+        f"- {i['finding']} ({i['component']}, confidence {i['confidence']:.0%}): {i['evidence']}" for i in issues
+    )
+
+
+_SYSTEM = (
+    "You are a diagnostics expert for IP cameras (home/office/street). "
+    "Given logs, summarize likely root causes, affected components, and confidence based on the evidence. "
+    "Output concise bullet points."
+)
+
+
+def _prepare(input_data: TaskInput) -> Dict[str, Any]:
+    # Everything except the LLM call; CPU-bound on large logs, so async callers run it in a thread.
+    # All passes stream the input line by line, so file-backed logs are never fully loaded.
+    ruleset = get_ruleset()
+    lines = input_data.iter_lines()
+    builder = None
+    if fingerprint.enabled(input_data.context):
+        # Line templates are collected during the rule scan, not in a pass of their own
+        builder = fingerprint.FingerprintBuilder(input_data.context)
+        lines = builder.feed(lines)
+    issues = ruleset.issues(ruleset.scan(lines))
+    job: Dict[str, Any] = {"issues": issues, "reused": None, "fingerprint": None}
+    fp = builder.result() if builder is not None else None
+    if fp is not None:
+        # A window with no new line templates for this camera reuses the last diagnosis
+        camera = fingerprint.camera_key(input_data.context, fp)
+        if camera is not None:
+            signature = fingerprint.findings_signature(issues)
+            job["fingerprint"] = (camera, fp, signature)
+            job["reused"] = fingerprint.get_index().lookup(camera, fp, signature)
+    if job["reused"] is not None:
+        job.update(skip_llm=True, prompt="", rules_text=job["reused"].get("summary", ""))
+        job["prompt_tokens"] = {"before": 0, "after": 0, "lines_before": 0, "condensed": False}
+        return job
+    condensed = condense_logs(input_data.iter_lines(), model_name=DEFAULT_MODEL)
+    skip_llm = tiering.is_confident(issues, tiering.confidence_threshold(input_data.context))
+    prompt = f"Logs:\n{condensed.text}\n\nProvide a brief diagnosis summary."
+    enriched = tiering.enriched_answer(prompt, _SYSTEM) if skip_llm else None
+    job.update(
+        prompt_tokens=condensed.stats(),
+        prompt=prompt,
+        skip_llm=skip_llm,
+        enriched=enriched is not None,
+        rules_text=(enriched or _rules_summary(issues)) if skip_llm else "",
     )
-    prompt = f"Logs:\n{input_data.logs}\n\nProvide a brief diagnosis summary."
-    text = generate_text(prompt, system)
+    return job
+
+
+def _finish(job: Dict[str, Any], text: str) -> TaskResult:
+    issues = job["issues"]
     details: Dict[str, Any] = {
         "summary": text,
         "issues": issues,
+        "prompt_tokens": job["prompt_tokens"],
     }
+    if job["reused"] is not None:
+        METRICS.incr("llm_calls_avoided", agent="diagnoser")
+        details.update(tier="fingerprint", llm_skipped=True)
+    else:
+        details.update(tiering.record_tier("diagnoser", job["skip_llm"]))
+        if job["enriched"]:
+            details["llm_enrichment"] = "applied"
+        elif job["skip_llm"] and tiering.enrich_in_background(job["prompt"], _SYSTEM):
+            details["llm_enrichment"] = "scheduled"
     # Prepare context for downstream agents
-    details["context"] = {"diagnosis": {"issues": issues, "summary": text}}
+    diagnosis = {"issues": issues, "summary": text}
+    details["context"] = {"diagnosis": diagnosis}
+    if job["fingerprint"] is not None:
+        camera, fp, signature = job["fingerprint"]
+        if job["reused"] is None and not is_fallback(text):
+            fingerprint.get_index().learn(camera, fp, diagnosis, signature)
+        details["fingerprint"] = {
+            "camera": camera,
+            "templates": len(fp.templates),
+            "reused": job["reused"] is not None,
+        }
     return TaskResult(status="ok", summary="Diagnosis produced", details=details)
+
+
+def run(input_data: TaskInput, on_delta: Optional[Callable[[str], None]] = None) -> TaskResult:
+    job = _prepare(input_data)
+    if job["skip_llm"]:
+        text = job["rules_text"]
+        if on_delta is not None:
+            on_delta(text)
+    else:
+        text = generate_text(job["prompt"], _SYSTEM, on_delta=on_delta)
+    return _finish(job, text)
+
+
+async def run_async(input_data: TaskInput) -> TaskResult:
+    # Non-blocking variant for async servers: no worker thread is held during the LLM call
+    job = await asyncio.to_thread(_prepare, input_data)
+    text = job["rules_text"] if job["skip_llm"] else await generate_text_async(job["prompt"], _SYSTEM)
+    return _finish(job, text)
@@ -0,0 +1,301 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.core.metrics import METRICS
+
+# Incremental diagnosis for cameras that keep re-sending overlapping log windows. Each line is
+# reduced to a template (timestamps dropped; IPs, percentages, camera ids, hex ids and numbers
+# replaced by placeholders) and a per-camera index remembers the templates behind the last diagnosis.
+# A new window whose templates are all known, and whose rule findings are unchanged, reuses
+# that diagnosis instead of condensing the log and calling the LLM again.
+#   A2A_FINGERPRINT                off (default) | on
+#   A2A_FINGERPRINT_INDEX          JSON file to load the index from at startup (see `warm` below)
+#   A2A_FINGERPRINT_MAX_CAMERAS    cameras kept, least recently used evicted (default 10000)
+#   A2A_FINGERPRINT_MAX_TEMPLATES  templates kept per camera (default 5000)
+
+_TOKEN = re.compile(
+    r"(?P<ts>\[?\d{4}-\d{2}-\d{2}[ t]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:z|[+-]\d{2}:?\d{2})?\]?)"
+    r"|(?P<ip>\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b|\b(?:[0-9a-f]{1,4}:){2,7}[0-9a-f]{1,4}\b)"
+    r"|(?P<pct>\d+(?:\.\d+)?\s*%)"
+    r"|(?P<cam>\bcam(?:era)?[-_]?\d+\b)"
+    r"|(?P<hex>\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\b)"
+    r"|(?P<n>\d+(?:\.\d+)?)"
+)
+_SPACE = re.compile(r"\s+")
+
+
+class LogFingerprint:
+    def __init__(self, templates: Set[str], cameras: Set[str], lines: int):
+        self.templates = templates
+        self.cameras = cameras
+        self.lines = lines
+
+
+def template(line: str, cameras: Optional[Set[str]] = None) -> str:
+    # "[2025-01-02 10:00:01] camera-7: loss 40% to 10.0.0.3" -> "<cam>: loss <pct> to <ip>"
+    def placeholder(m: "re.Match[str]") -> str:
+        if m.lastgroup == "ts":
+            return ""
+        if m.lastgroup == "cam" and cameras is not None:
+            cameras.add(m.group(0))
+        return f"<{m.lastgroup}>"
+
+    return _SPACE.sub(" ", _TOKEN.sub(placeholder, line.lower())).strip()
+
+
+def fingerprint(lines: Iterable[str]) -> LogFingerprint:
+    templates: Set[str] = set()
+    cameras: Set[str] = set()
+    count = 0
+    for line in lines:
+        count += 1
+        shape = template(line, cameras)
+        if shape:
+            templates.add(shape)
+    return LogFingerprint(templates, cameras, count)
+
+
+class FingerprintBuilder:
+    # Templates lines as they stream through another pass (the Diagnoser's rule scan), so the
+    # log is read once. Without a caller camera_id a window naming several cameras has no key
+    # that will repeat, so templating stops at the second camera.
+    def __init__(self, context: Optional[Dict[str, Any]] = None):
+        self.camera_id = (context or {}).get("camera_id")
+        self.templates: Set[str] = set()
+        self.cameras: Set[str] = set()
+        self.lines = 0
+        self.keyed = True
+
+    def feed(self, lines: Iterable[str]) -> Iterator[str]:
+        for line in lines:
+            self.lines += 1
+            if self.keyed:
+                shape = template(line, self.cameras)
+                if shape:
+                    self.templates.add(shape)
+                if not self.camera_id and len(self.cameras) > 1:
+                    self.keyed = False
+                    self.templates.clear()
+            yield line
+
+    def result(self) -> Optional[LogFingerprint]:
+        return LogFingerprint(self.templates, self.cameras, self.lines) if self.keyed else None
+
+
+def camera_key(context: Optional[Dict[str, Any]], fp: LogFingerprint) -> Optional[str]:
+    # The caller's camera_id when given; otherwise the one camera named in the log. Logs that
+    # name several cameras (or none) are not indexed: their camera set rarely comes back.
+    camera = (context or {}).get("camera_id")
+    if camera:
+        return str(camera)
+    if len(fp.cameras) == 1:
+        return next(iter(fp.cameras))
+    return None
+
+
+def findings_signature(issues: List[Dict[str, Any]]) -> List[Tuple[str, str, float]]:
+    # What the rules concluded, without line numbers; a change forces a fresh diagnosis
+    return sorted(
+        (str(i.get("component")), str(i.get("finding")), float(i.get("confidence") or 0.0))
+        for i in issues
+    )
+
+
+class _CameraEntry:
+    def __init__(self) -> None:
+        self.templates: Set[str] = set()
+        self.diagnosis: Optional[Dict[str, Any]] = None
+        self.signature: Optional[List[Tuple[str, str, float]]] = None
+        self.updated = 0.0
+
+
+class TemplateIndex:
+    def __init__(self, max_cameras: int = 10000, max_templates: int = 5000):
+        self.max_cameras = max_cameras
+        self.max_templates = max_templates
+        self._cameras: "OrderedDict[str, _CameraEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_locked(self, camera: str) -> _CameraEntry:
+        entry = self._cameras.get(camera)
+        if entry is None:
+            entry = self._cameras[camera] = _CameraEntry()
+            while len(self._cameras) > self.max_cameras:
+                self._cameras.popitem(last=False)
+        else:
+            self._cameras.move_to_end(camera)
+        return entry
+
+    def _add_templates_locked(self, entry: _CameraEntry, templates: Iterable[str]) -> None:
+        for shape in templates:
+            if len(entry.templates) >= self.max_templates:
+                break
+            entry.templates.add(shape)
+
+    def new_templates(self, camera: str, fp: LogFingerprint) -> Set[str]:
+        with self._lock:
+            entry = self._cameras.get(camera)
+            return set(fp.templates) if entry is None else fp.templates - entry.templates
+
+    def lookup(
+        self, camera: str, fp: LogFingerprint, signature: List[Tuple[str, str, float]]
+    ) -> Optional[Dict[str, Any]]:
+        # The stored diagnosis when nothing new is in the window, else None
+        with self._lock:
+            entry = self._cameras.get(camera)
+            reusable = (
+                entry is not None
+                and entry.diagnosis is not None
+                and entry.signature == signature
+                and fp.templates <= entry.templates
+            )
+            if reusable:
+                self._cameras.move_to_end(camera)
+                METRICS.incr("fingerprint_hits")
+                return entry.diagnosis
+        METRICS.incr("fingerprint_misses")
+        return None
+
+    def learn(
+        self,
+        camera: str,
+        fp: LogFingerprint,
+        diagnosis: Optional[Dict[str, Any]],
+        signature: Optional[List[Tuple[str, str, float]]] = None,
+    ) -> None:
+        with self._lock:
+            entry = self._entry_locked(camera)
+            self._add_templates_locked(entry, fp.templates)
+            if diagnosis is not None:
+                entry.diagnosis = diagnosis
+                entry.signature = signature
+            entry.updated = time.time()
+
+    def warm(
+        self,
+        camera: str,
+        lines: Iterable[str],
+        diagnosis: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        # Seed from historical logs; with a diagnosis (issues + summary) later windows that
+        # contain nothing new are answered from it straight away. Returns templates added.
+        fp = fingerprint(lines)
+        before = len(self.new_templates(camera, fp))
+        signature = findings_signature(diagnosis.get("issues") or []) if diagnosis else None
+        self.learn(camera, fp, diagnosis, signature)
+        return before
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cameras": len(self._cameras),
+                "templates": sum(len(e.templates) for e in self._cameras.values()),
+                "with_diagnosis": sum(1 for e in self._cameras.values() if e.diagnosis),
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                camera: {
+                    "templates": sorted(entry.templates),
+                    "diagnosis": entry.diagnosis,
+                    "signature": entry.signature,
+                    "updated": entry.updated,
+                }
+                for camera, entry in self._cameras.items()
+            }
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            for camera, item in data.items():
+                entry = self._entry_locked(camera)
+                self._add_templates_locked(entry, item.get("templates") or [])
+                if item.get("diagnosis") is not None:
+                    entry.diagnosis = item["diagnosis"]
+                    signature = item.get("signature")
+                    if signature is not None:
+                        signature = [tuple(s) for s in signature]
+                    entry.signature = signature
+                entry.updated = float(item.get("updated") or 0.0)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    def load(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            self.load_dict(json.load(f))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cameras.clear()
+
+
+_INDEX: Optional[TemplateIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def enabled(context: Optional[Dict[str, Any]] = None) -> bool:
+    # context {"rediagnose": true} bypasses the index for one run
+    if (context or {}).get("rediagnose"):
+        return False
+    return os.getenv("A2A_FINGERPRINT", "off").lower() in ("1", "on", "true", "yes")
+
+
+def get_index() -> TemplateIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                index = TemplateIndex(
+                    max_cameras=int(os.getenv("A2A_FINGERPRINT_MAX_CAMERAS", "10000")),
+                    max_templates=int(os.getenv("A2A_FINGERPRINT_MAX_TEMPLATES", "5000")),
+                )
+                path = os.getenv("A2A_FINGERPRINT_INDEX")
+                if path and os.path.exists(path):
+                    index.load(path)
+                _INDEX = index
+    return _INDEX
+
+
+def set_index(index: Optional[TemplateIndex]) -> None:
+    global _INDEX
+    _INDEX = index
+
+
+def main(argv=None) -> int:
+    # Warm an index file from historical logs, one camera per file:
+    #   python -m app.agents.fingerprint index.json cam-7=/var/log/cam7.log cam-9=/var/log/cam9.log
+    # then start agents with A2A_FINGERPRINT_INDEX=index.json
+    parser = argparse.ArgumentParser(description="Build a log template index from historical logs.")
+    parser.add_argument("index", help="Index JSON file (created or extended)")
+    parser.add_argument("logs", nargs="+", help="camera=path pairs")
+    args = parser.parse_args(argv)
+
+    index = TemplateIndex()
+    if os.path.exists(args.index):
+        index.load(args.index)
+    for item in args.logs:
+        camera, _, path = item.partition("=")
+        if not path:
+            parser.error(f"expected camera=path, got {item!r}")
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            added = index.warm(camera, (line.rstrip("\r\n") for line in f))
+        print(f"{camera}: {added} new templates", file=sys.stderr)
+    index.save(args.index)
+    print(json.dumps(index.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
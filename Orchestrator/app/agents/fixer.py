@@ -1,6 +1,9 @@
-from typing import Dict, Any, List
+import asyncio
+from typing import Callable, Dict, Any, List, Optional
 from app.core.a2a_models import TaskInput, TaskResult, AgentCard
-from app.core.gemini import generate_text
+from app.core.gemini import DEFAULT_MODEL, generate_text, generate_text_async
+from app.agents import tiering
+from app.agents.prompting import compact_issues, condense_logs, estimate_tokens
 
 
 def get_agent_card() -> AgentCard:
@@ -39,27 +42,81 @@ def _baseline_plan(issues: List[Dict[str, Any]]) -> List[str]:
     return steps
 
 
-def run(input_data: TaskInput) -> TaskResult:
-    issues = input_data.context.get("diagnosis", {}).get("issues") if input_data.context else None
-    issues = issues or []
+_SYSTEM = (
+    "You are a remediation expert for IP cameras. Combine the baseline steps with additional safe, "
+    "practical steps tailored to the provided diagnosis. Return a short numbered list."
+)
+
+
+def _prepare(input_data: TaskInput) -> Dict[str, Any]:
+    # Everything except the LLM call; async callers run it in a thread
+    diagnosis = (input_data.context or {}).get("diagnosis") or {}
+    issues = diagnosis.get("issues") or []
     base_steps = _baseline_plan(issues)
-    system = (
-        "You are a remediation expert for IP cameras. Combine the baseline steps with additional safe, "
-        "practical steps tailored to the provided diagnosis. Return a short numbered list."
-    )
+    condensed = condense_logs(input_data.iter_lines(), model_name=DEFAULT_MODEL)
+    prompt_issues = str(compact_issues(issues))
     prompt = (
         "Diagnosis context (JSON-like):\n"
-        f"{issues}\n\n"
-        f"Logs:\n{input_data.logs}\n\n"
+        f"{prompt_issues}\n\n"
+        f"Diagnosis summary:\n{diagnosis.get('summary', '')}\n\n"
+        f"Logs:\n{condensed.text}\n\n"
         "Propose a fix plan in steps (1-7)."
     )
-    llm_steps_text = generate_text(prompt, system)
-    details: Dict[str, Any] = {"plan": llm_steps_text, "baseline": base_steps}
+    prompt_tokens = condensed.stats()
+    prompt_tokens["before"] += estimate_tokens(str(issues))
+    prompt_tokens["after"] += estimate_tokens(prompt_issues)
+    skip_llm = tiering.is_confident(issues, tiering.confidence_threshold(input_data.context))
+    enriched = tiering.enriched_answer(prompt, _SYSTEM) if skip_llm else None
+    baseline_text = "\n".join(f"{n}. {step}" for n, step in enumerate(base_steps, start=1))
+    return {
+        "base_steps": base_steps,
+        "prompt": prompt,
+        "prompt_tokens": prompt_tokens,
+        "skip_llm": skip_llm,
+        "enriched": enriched is not None,
+        # What a confident run answers with: an earlier enrichment's plan, else the baseline
+        "skip_text": enriched or baseline_text,
+    }
+
+
+def _finish(input_data: TaskInput, job: Dict[str, Any], llm_steps_text: str) -> TaskResult:
+    base_steps = job["base_steps"]
+    details: Dict[str, Any] = {
+        "plan": llm_steps_text,
+        "baseline": base_steps,
+        "prompt_tokens": job["prompt_tokens"],
+        **tiering.record_tier("fixer", job["skip_llm"]),
+    }
+    if job["enriched"]:
+        details["llm_enrichment"] = "applied"
+    elif job["skip_llm"] and tiering.enrich_in_background(job["prompt"], _SYSTEM):
+        details["llm_enrichment"] = "scheduled"
     # Simple escalation heuristic
     lowered = f"{llm_steps_text} {' '.join(base_steps)}".lower()
     status = "needs_support" if any(k in lowered for k in ["rma", "support", "ticket", "hardware fault"]) else "ok"
-    # Propagate context forward
-    ctx = input_data.context or {}
-    ctx["fix_plan"] = {"baseline": base_steps, "llm": llm_steps_text}
-    details["context"] = ctx
+    # Propagate context forward; the input context is shared with the caller's events, so it
+    # is extended into a new dict rather than modified
+    fix_plan = {"baseline": base_steps, "llm": llm_steps_text}
+    details["context"] = {**(input_data.context or {}), "fix_plan": fix_plan}
     return TaskResult(status=status, summary="Fix plan produced", details=details)
+
+
+def run(input_data: TaskInput, on_delta: Optional[Callable[[str], None]] = None) -> TaskResult:
+    job = _prepare(input_data)
+    if job["skip_llm"]:
+        llm_steps_text = job["skip_text"]
+        if on_delta is not None:
+            on_delta(llm_steps_text)
+    else:
+        llm_steps_text = generate_text(job["prompt"], _SYSTEM, on_delta=on_delta)
+    return _finish(input_data, job, llm_steps_text)
+
+
+async def run_async(input_data: TaskInput) -> TaskResult:
+    # Non-blocking variant for async servers: no worker thread is held during the LLM call
+    job = await asyncio.to_thread(_prepare, input_data)
+    if job["skip_llm"]:
+        llm_steps_text = job["skip_text"]
+    else:
+        llm_steps_text = await generate_text_async(job["prompt"], _SYSTEM)
+    return _finish(input_data, job, llm_steps_text)
@@ -0,0 +1,64 @@
+import importlib
+import os
+import threading
+from types import ModuleType
+from typing import Dict, Iterator, List, Optional
+
+# Agents are imported on first use, so a process only pays for the agents it runs.
+#   A2A_AGENTS  comma-separated agent ids this process serves (default: all of them)
+AGENT_MODULES: Dict[str, str] = {
+    "diagnoser": "app.agents.diagnoser",
+    "fixer": "app.agents.fixer",
+    "support": "app.agents.support",
+}
+
+
+def selected_agents(value: Optional[str] = None) -> List[str]:
+    # "diagnoser" or "diagnoser,fixer"; unknown ids are an error rather than a silent no-op
+    value = os.getenv("A2A_AGENTS", "") if value is None else value
+    wanted = [a.strip() for a in value.split(",") if a.strip()]
+    if not wanted:
+        return list(AGENT_MODULES)
+    unknown = [a for a in wanted if a not in AGENT_MODULES]
+    if unknown:
+        raise ValueError(f"Unknown agent(s) in A2A_AGENTS: {', '.join(unknown)}")
+    return wanted
+
+
+class LazyAgents:
+    # Read-only mapping of agent id -> agent module, importing each module on first access
+    def __init__(self, agent_ids: Optional[List[str]] = None):
+        self.agent_ids = list(agent_ids) if agent_ids is not None else list(AGENT_MODULES)
+        self._modules: Dict[str, ModuleType] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, agent_id: object) -> bool:
+        return agent_id in self.agent_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.agent_ids)
+
+    def __len__(self) -> int:
+        return len(self.agent_ids)
+
+    def __getitem__(self, agent_id: str) -> ModuleType:
+        module = self._modules.get(agent_id)
+        if module is not None:
+            return module
+        if agent_id not in self.agent_ids:
+            raise KeyError(agent_id)
+        with self._lock:
+            module = self._modules.get(agent_id)
+            if module is None:
+                module = self._modules[agent_id] = importlib.import_module(AGENT_MODULES[agent_id])
+            return module
+
+    def get(self, agent_id: str) -> Optional[ModuleType]:
+        return self[agent_id] if agent_id in self.agent_ids else None
+
+    def loaded(self) -> List[str]:
+        return [a for a in self.agent_ids if a in self._modules]
+
+    def preload(self) -> None:
+        for agent_id in self.agent_ids:
+            self[agent_id]
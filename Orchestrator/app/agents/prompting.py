@@ -0,0 +1,174 @@
+import os
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.agents.rules import RuleSet, get_ruleset
+
+# Rough budgets for the log section of a prompt, in estimated tokens
+MODEL_TOKEN_BUDGETS: Dict[str, int] = {
+    "gemini-1.5-flash": 4000,
+    "gemini-1.5-pro": 8000,
+}
+_DEFAULT_TOKEN_BUDGET = 4000
+_HEAD_LINES = 10
+_TS_PREFIX = re.compile(r"^\s*\[?(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)\]?\s*")
+
+_PRIORITY_CONTEXT = 0
+_PRIORITY_HEAD = 1
+_PRIORITY_MATCH = 2
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting without a tokenizer round trip
+    return (len(text) + 3) // 4
+
+
+def token_budget(model_name: str) -> int:
+    raw = os.getenv("A2A_PROMPT_TOKEN_BUDGET")
+    if raw:
+        try:
+            return int(raw)
+        except ValueError:
+            pass
+    return MODEL_TOKEN_BUDGETS.get(model_name, _DEFAULT_TOKEN_BUDGET)
+
+
+def context_lines() -> int:
+    try:
+        return int(os.getenv("A2A_PROMPT_CONTEXT_LINES", "1"))
+    except ValueError:
+        return 1
+
+
+class CondensedLogs:
+    def __init__(self, text: str, tokens_before: int, lines_before: int, condensed: bool):
+        self.text = text
+        self.tokens_before = tokens_before
+        self.tokens_after = estimate_tokens(text)
+        self.lines_before = lines_before
+        self.condensed = condensed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "before": self.tokens_before,
+            "after": self.tokens_after,
+            "lines_before": self.lines_before,
+            "condensed": self.condensed,
+        }
+
+
+class _Entry:
+    def __init__(self, body: str, ts: Optional[str], priority: int, order: int):
+        self.body = body
+        self.first_ts = ts
+        self.last_ts = ts
+        self.count = 1
+        self.priority = priority
+        self.order = order
+
+    def render(self) -> str:
+        if self.first_ts is None:
+            stamp = ""
+        elif self.count > 1 and self.last_ts != self.first_ts:
+            stamp = f"[{self.first_ts} .. {self.last_ts}] "
+        else:
+            stamp = f"[{self.first_ts}] "
+        repeat = f"(x{self.count}) " if self.count > 1 else ""
+        return f"{stamp}{repeat}{self.body}"
+
+
+def condense_logs(
+    lines: Iterable[str],
+    budget: Optional[int] = None,
+    model_name: str = "",
+    ruleset: Optional[RuleSet] = None,
+) -> CondensedLogs:
+    # Logs that fit the budget pass through untouched. Otherwise, in one pass: timestamps are
+    # stripped so repeated lines collapse into one entry with a count and time range, only
+    # rule-matched lines (plus neighbours and the first few lines) are kept, and the result
+    # is trimmed by priority to the token budget.
+    budget = budget if budget is not None else token_budget(model_name)
+    ruleset = ruleset or get_ruleset()
+    around = context_lines()
+    raw: Optional[List[str]] = []
+    raw_tokens = 0
+    tokens_before = 0
+    total = 0
+    entries: Dict[str, _Entry] = {}
+    recent: Deque[Tuple[str, Optional[str]]] = deque(maxlen=max(around, 0))
+    trailing = 0
+
+    # Bound memory on huge logs: beyond this many distinct lines, only existing ones are counted
+    max_entries = max(1000, budget)
+
+    def add(line_body: str, ts: Optional[str], priority: int) -> None:
+        entry = entries.get(line_body)
+        if entry is None:
+            if len(entries) < max_entries:
+                entries[line_body] = _Entry(line_body, ts, priority, len(entries))
+            return
+        entry.count += 1
+        entry.last_ts = ts or entry.last_ts
+        entry.priority = max(entry.priority, priority)
+
+    for line in lines:
+        total += 1
+        line_tokens = estimate_tokens(line) + 1
+        tokens_before += line_tokens
+        if raw is not None:
+            raw.append(line)
+            raw_tokens += line_tokens
+            if raw_tokens > budget:
+                raw = None
+        m = _TS_PREFIX.match(line)
+        ts = m.group("ts") if m else None
+        body = line[m.end():] if m else line.strip()
+        if not body:
+            continue
+        if ruleset.is_relevant(line):
+            while recent:
+                add(*recent.popleft(), _PRIORITY_CONTEXT)
+            add(body, ts, _PRIORITY_MATCH)
+            trailing = around
+        elif body in entries:
+            add(body, ts, _PRIORITY_CONTEXT)
+        elif trailing > 0:
+            add(body, ts, _PRIORITY_CONTEXT)
+            trailing -= 1
+        elif total <= _HEAD_LINES:
+            add(body, ts, _PRIORITY_HEAD)
+        elif recent.maxlen:
+            recent.append((body, ts))
+
+    if raw is not None:
+        return CondensedLogs("\n".join(raw), tokens_before, total, condensed=False)
+    return CondensedLogs(_fit(list(entries.values()), budget, total), tokens_before, total, condensed=True)
+
+
+def _fit(entries: List[_Entry], budget: int, total_lines: int) -> str:
+    kept: List[_Entry] = []
+    used = 0
+    for entry in sorted(entries, key=lambda e: (-e.priority, -e.count, e.order)):
+        cost = estimate_tokens(entry.render()) + 1
+        if used + cost > budget:
+            continue
+        kept.append(entry)
+        used += cost
+    kept.sort(key=lambda e: e.order)
+    covered = sum(e.count for e in kept)
+    out = [e.render() for e in kept]
+    if covered < total_lines:
+        out.append(f"... [{total_lines - covered} of {total_lines} lines omitted to fit the prompt budget]")
+    return "\n".join(out)
+
+
+def compact_issues(issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Drop bulky evidence (line numbers, per-camera breakdown) from the prompt copy of issues
+    compact = []
+    for issue in issues:
+        item = {k: v for k, v in issue.items() if k not in ("lines", "cameras")}
+        if issue.get("cameras"):
+            item["cameras_affected"] = len(issue["cameras"])
+        compact.append(item)
+    return compact
@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Declarative rule table for the Diagnoser. A rule fires when every group in `all_of`
+# has at least one keyword present (case-insensitive substring). An optional `metric`
+# attaches the worst percentage seen on the rule's evidence lines and can raise the
+# confidence. The same shape can be loaded from JSON or YAML (A2A_DIAGNOSER_RULES).
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {
+        "id": "rtsp_instability",
+        "component": "stream",
+        "finding": "RTSP instability (drops/reconnects)",
+        "confidence": 0.7,
+        "evidence": "rtsp + drops/reconnect in logs",
+        "all_of": [["rtsp"], ["drop", "reconnect"]],
+    },
+    {
+        "id": "packet_loss",
+        "component": "network",
+        "finding": "Intermittent connectivity / packet loss",
+        "confidence": 0.6,
+        "evidence": "timeout/ping loss",
+        "all_of": [["timeout", "ping", "%"]],
+        "metric": {"name": "packet_loss_percent", "unit": "%", "boost_at": 30, "boost_confidence": 0.75},
+    },
+    {
+        "id": "outdated_firmware",
+        "component": "firmware",
+        "finding": "Outdated firmware",
+        "confidence": 0.8,
+        "evidence": "version older than latest",
+        "all_of": [["firmware"], ["latest", "version"]],
+    },
+]
+
+_MAX_EVIDENCE_LINES = 20
+# Lines are lowercased and scanned in blocks: keywords absent from a block are not looked
+# for line by line, and only lines with evidence have their "[timestamp] camera-N:" prefix
+# read with an anchored match.
+_BLOCK_LINES = 4096
+_HEAD = re.compile(r"\s*\[?(?P<ts>\d{4}-\d{2}-\d{2}[ t]\d{2}:\d{2}:\d{2})?\]?\s*(?P<cam>cam(?:era)?[-_]?\d+\b)?")
+_CAM = re.compile(r"\bcam(?:era)?[-_]?\d+\b")
+_NUMBER = re.compile(r"(\d+(?:\.\d+)?)")
+_PCT = re.compile(r"(\d+(?:\.\d+)?)\s*$")
+_PCT_WINDOW = 32
+
+
+def _percentages(line: str) -> List[float]:
+    # The number right before each "%". Usually it is the last word in front of the sign;
+    # anything else ("v1.2.50%", "x=5%") goes through a regex over a short window.
+    values: List[float] = []
+    end = line.find("%")
+    while end != -1:
+        before = line[max(0, end - _PCT_WINDOW) : end].rstrip()
+        word = before.rpartition(" ")[2]
+        m = _NUMBER.fullmatch(word) or _PCT.search(before)
+        if m:
+            values.append(float(m.group(1)))
+        end = line.find("%", end + 1)
+    return values
+
+
+class _Scope:
+    # Evidence gathered for the whole log or for a single camera
+    def __init__(self) -> None:
+        self.lines: Dict[str, List[int]] = {}
+        self.max_pct: Dict[str, float] = {}
+        self.pct_count = 0
+        self.first_ts: Optional[str] = None
+        self.last_ts: Optional[str] = None
+
+    def add(self, line_no: int, keywords: Set[str], pcts: List[float], ts: Optional[str]) -> None:
+        lines = self.lines
+        for kw in keywords:
+            hits = lines.get(kw)
+            if hits is None:
+                lines[kw] = [line_no]
+            elif len(hits) < _MAX_EVIDENCE_LINES:
+                hits.append(line_no)
+        if pcts:
+            top = max(pcts)
+            for kw in keywords:
+                if top > self.max_pct.get(kw, -1.0):
+                    self.max_pct[kw] = top
+            self.pct_count += len(pcts)
+        if ts:
+            self.first_ts = self.first_ts or ts
+            self.last_ts = ts
+
+
+class ScanResult:
+    def __init__(self) -> None:
+        self.overall = _Scope()
+        self.cameras: Dict[str, _Scope] = {}
+        self.line_count = 0
+
+
+def _number(value: float) -> Any:
+    return int(value) if float(value).is_integer() else value
+
+
+class RuleSet:
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        keywords = {kw.lower() for rule in rules for group in rule["all_of"] for kw in group}
+        # "%" is recognised through the percentage pattern so values are captured too
+        self._pct_keyword = "%" in keywords
+        keywords.discard("%")
+        ordered = sorted(keywords, key=len, reverse=True)
+        self._keywords = re.compile("|".join(re.escape(k) for k in ordered)) if ordered else None
+        self._literals = ordered
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                import yaml  # type: ignore
+
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        return cls(data["rules"] if isinstance(data, dict) else data)
+
+    def is_relevant(self, line: str) -> bool:
+        lowered = line.lower()
+        if self._pct_keyword and "%" in lowered:
+            return True
+        return bool(self._keywords and self._keywords.search(lowered))
+
+    def scan(self, lines: Iterable[str], result: Optional[ScanResult] = None) -> ScanResult:
+        # Single pass over the log; can be fed incrementally by passing the previous result.
+        # Lines without a keyword or a percentage carry no evidence and are only counted.
+        result = result or ScanResult()
+        it = iter(lines)
+        while True:
+            block = list(itertools.islice(it, _BLOCK_LINES))
+            if not block:
+                return result
+            self._scan_block(block, result)
+
+    def _scan_block(self, block: List[str], result: ScanResult) -> None:
+        text = "\n".join(block).lower()
+        lowered = text.split("\n")
+        if len(lowered) != len(block):
+            # A line with an embedded newline: lowercase line by line to keep the numbering
+            lowered = [line.lower() for line in block]
+            text = "\n".join(lowered)
+        # Only keywords present somewhere in the block are looked for line by line
+        present = [kw for kw in self._literals if kw in text]
+        percent = "%" in text
+        if not (present or percent):
+            result.line_count += len(block)
+            return
+        base = result.line_count
+        for index, line in enumerate(lowered, start=base + 1):
+            keywords = {kw for kw in present if kw in line}
+            pcts: List[float] = []
+            if percent and "%" in line:
+                pcts = _percentages(line)
+                if self._pct_keyword:
+                    keywords.add("%")
+            if not (keywords or pcts):
+                continue
+            head = _HEAD.match(line)
+            ts = head.group("ts")
+            camera = head.group("cam")
+            if camera is None and "cam" in line:
+                m = _CAM.search(line)
+                camera = m.group(0) if m else None
+            result.overall.add(index, keywords, pcts, ts)
+            if camera is not None:
+                scope = result.cameras.get(camera)
+                if scope is None:
+                    scope = result.cameras[camera] = _Scope()
+                scope.add(index, keywords, pcts, ts)
+        result.line_count += len(block)
+
+    def _evaluate(self, rule: Dict[str, Any], scope: _Scope) -> Optional[Dict[str, Any]]:
+        groups = [[kw.lower() for kw in group] for group in rule["all_of"]]
+        if not all(any(kw in scope.lines for kw in group) for group in groups):
+            return None
+        hit_keywords = [kw for group in groups for kw in group if kw in scope.lines]
+        lines = sorted({n for kw in hit_keywords for n in scope.lines[kw]})[:_MAX_EVIDENCE_LINES]
+        issue: Dict[str, Any] = {"confidence": rule["confidence"], "lines": lines}
+        metric = rule.get("metric")
+        if metric:
+            values = [scope.max_pct[kw] for kw in hit_keywords if kw in scope.max_pct]
+            value = _number(max(values)) if values else None
+            issue[metric["name"]] = value
+            if value is not None and metric.get("boost_at") is not None and value >= metric["boost_at"]:
+                issue["confidence"] = metric.get("boost_confidence", rule["confidence"])
+            issue["value_suffix"] = f" {value}{metric.get('unit', '')}" if value is not None else ""
+        return issue
+
+    def issues(self, scan: ScanResult) -> List[Dict[str, Any]]:
+        issues: List[Dict[str, Any]] = []
+        for rule in self.rules:
+            overall = self._evaluate(rule, scan.overall)
+            if overall is None:
+                continue
+            suffix = overall.pop("value_suffix", "")
+            issue: Dict[str, Any] = {
+                "component": rule["component"],
+                "finding": rule["finding"],
+                "confidence": overall.pop("confidence"),
+                "evidence": f"{rule.get('evidence', rule['id'])}{suffix}",
+                **overall,
+            }
+            cameras: Dict[str, Dict[str, Any]] = {}
+            for camera_id, scope in scan.cameras.items():
+                per_camera = self._evaluate(rule, scope)
+                if per_camera is not None:
+                    per_camera.pop("value_suffix", None)
+                    per_camera["first_seen"] = scope.first_ts
+                    per_camera["last_seen"] = scope.last_ts
+                    cameras[camera_id] = per_camera
+            if cameras:
+                issue["cameras"] = cameras
+            issues.append(issue)
+        return issues
+
+    def parse(self, logs: str) -> List[Dict[str, Any]]:
+        return self.issues(self.scan(logs.splitlines()))
+
+
+_DEFAULT_RULESET: Optional[RuleSet] = None
+
+
+def get_ruleset() -> RuleSet:
+    global _DEFAULT_RULESET
+    if _DEFAULT_RULESET is None:
+        path = os.getenv("A2A_DIAGNOSER_RULES")
+        _DEFAULT_RULESET = RuleSet.from_file(path) if path else RuleSet(DEFAULT_RULES)
+    return _DEFAULT_RULESET
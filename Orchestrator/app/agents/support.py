@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
 from app.core.a2a_models import TaskInput, TaskResult, AgentCard
 
 
@@ -14,10 +14,16 @@ def get_agent_card() -> AgentCard:
     )
 
 
-def run(input_data: TaskInput) -> TaskResult:
+def run(input_data: TaskInput, on_delta: Optional[Callable[[str], None]] = None) -> TaskResult:
+    # No LLM call here; on_delta is accepted so all agents share one signature
+    import hashlib
     import uuid
 
-    ticket_id = str(uuid.uuid4())[:8]
+    # Retries and resumed runs carry the same idempotency key and get the same ticket back
+    key = input_data.idempotency_key
+    ticket_id = hashlib.sha256(key.encode("utf-8")).hexdigest()[:8] if key else str(uuid.uuid4())[:8]
+    if ticket_id in _FAKE_DB:
+        return _ticket_result(ticket_id, _FAKE_DB[ticket_id])
     diagnosis = (input_data.context or {}).get("diagnosis", {})
     fix_plan = (input_data.context or {}).get("fix_plan", {})
     severity = "medium"
@@ -30,7 +36,7 @@ def run(input_data: TaskInput) -> TaskResult:
             pass
     payload = {
         "title": "Camera issue reported",
-        "body": input_data.logs[:1000],
+        "body": f"Need support. Context:\n\n{fix_plan.get('llm', '')}\n\n{input_data.head(1000)}"[:1000],
         "status": "open",
         "severity": severity,
         "context": {
@@ -39,6 +45,10 @@ def run(input_data: TaskInput) -> TaskResult:
         },
     }
     _FAKE_DB[ticket_id] = payload
+    return _ticket_result(ticket_id, payload)
+
+
+def _ticket_result(ticket_id: str, payload: Dict[str, Any]) -> TaskResult:
     return TaskResult(
         status="ok",
         summary=f"Support ticket created: {ticket_id}",
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.core.gemini import cached_text, generate_text
+from app.core.metrics import METRICS
+
+# Tiered execution: when every rule-based finding is at or above the threshold, agents
+# answer from rules/baselines and skip the LLM. Unset threshold means always call the LLM.
+_ENRICH_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def confidence_threshold(context: Optional[Dict[str, Any]] = None) -> Optional[float]:
+    raw = (context or {}).get("confidence_threshold", os.getenv("A2A_SKIP_LLM_CONFIDENCE"))
+    if raw in (None, ""):
+        return None
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_confident(issues: List[Dict[str, Any]], threshold: Optional[float]) -> bool:
+    if threshold is None or not issues:
+        return False
+    return all(float(i.get("confidence") or 0.0) >= threshold for i in issues)
+
+
+def record_tier(agent: str, skipped: bool) -> Dict[str, Any]:
+    METRICS.incr("llm_calls_avoided" if skipped else "llm_calls", agent=agent)
+    return {"tier": "rules" if skipped else "llm", "llm_skipped": skipped}
+
+
+def _enrich_enabled() -> bool:
+    return os.getenv("A2A_LLM_ENRICH_ASYNC", "").lower() in ("1", "true", "yes")
+
+
+def enriched_answer(prompt: str, system_instruction: str) -> Optional[str]:
+    # The LLM answer a background enrichment stored for this prompt, if it has finished.
+    # Confident runs on the same input then return it instead of the rules/baseline text,
+    # still without waiting on the LLM.
+    if not _enrich_enabled():
+        return None
+    text = cached_text(prompt, system_instruction)
+    if text is not None:
+        METRICS.incr("llm_enrichments_applied")
+    return text
+
+
+def enrich_in_background(prompt: str, system_instruction: str) -> bool:
+    # Optionally still ask the LLM off the hot path; the answer lands in the response cache,
+    # where enriched_answer() picks it up for the next run on the same input
+    global _ENRICH_POOL
+    if not _enrich_enabled():
+        return False
+    if _ENRICH_POOL is None:
+        _ENRICH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-enrich")
+    _ENRICH_POOL.submit(generate_text, prompt, system_instruction)
+    METRICS.incr("llm_enrichments_scheduled")
+    return True
@@ -1,6 +1,9 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Literal, Optional
-from pydantic import BaseModel, Field
+import io
+import time
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional
+from pydantic import BaseModel, Field, PrivateAttr, model_serializer, model_validator
+from pydantic_core import to_jsonable_python
 
 
 class AgentCard(BaseModel):
@@ -11,9 +14,34 @@ class AgentCard(BaseModel):
     version: str = "0.1.0"
 
 
+class LogRef(BaseModel):
+    # Pointer to a log file that is read line by line instead of being held in memory
+    path: str
+    encoding: str = "utf-8"
+    size: Optional[int] = None
+
+
 class TaskInput(BaseModel):
-    logs: str
+    logs: str = ""
     context: Optional[Dict[str, Any]] = None
+    log_ref: Optional[LogRef] = None
+    # Stable per workflow step (e.g. "task-1:support") so side effects can be deduplicated on retry
+    idempotency_key: Optional[str] = None
+
+    def iter_lines(self) -> Iterator[str]:
+        if self.log_ref is not None:
+            with open(self.log_ref.path, "r", encoding=self.log_ref.encoding, errors="replace") as f:
+                for line in f:
+                    yield line.rstrip("\r\n")
+            return
+        for line in io.StringIO(self.logs):
+            yield line.rstrip("\r\n")
+
+    def head(self, max_chars: int) -> str:
+        if self.log_ref is None:
+            return self.logs[:max_chars]
+        with open(self.log_ref.path, "r", encoding=self.log_ref.encoding, errors="replace") as f:
+            return f.read(max_chars)
 
 
 class TaskResult(BaseModel):
@@ -21,12 +49,17 @@ class TaskResult(BaseModel):
     summary: str
     details: Dict[str, Any] = Field(default_factory=dict)
 
+    def brief(self) -> Dict[str, Any]:
+        # What "summary" event verbosity keeps of a result
+        return {"status": self.status, "summary": self.summary}
+
 
 class Event(BaseModel):
     type: Literal[
         "task.created",
         "task.started",
         "agent.started",
+        "agent.delta",
         "agent.completed",
         "delegation.requested",
         "delegation.completed",
@@ -36,11 +69,87 @@ class Event(BaseModel):
     message: str
     data: Dict[str, Any] = Field(default_factory=dict)
 
+    @model_validator(mode="after")
+    def _stamp(self) -> "Event":
+        # time.monotonic() at creation (process-local; subtract two stamps for a duration).
+        # Events replayed from the task store keep their original stamp.
+        if "ts_mono" not in self.data:
+            self.data = {**self.data, "ts_mono": round(time.monotonic(), 6)}
+        return self
+
+    # Bulky parts of the payload (task input, agent card, result) can be deferred: they are
+    # built from the objects they describe by payload() or when the event is serialized, not
+    # when it is emitted. `data` always holds only the cheap keys (ids, timings) of such an
+    # event, whoever has looked at it; payload() is the complete one.
+    _build: Optional[Callable[[], Dict[str, Any]]] = PrivateAttr(default=None)
+    _brief: Optional[Callable[[], Dict[str, Any]]] = PrivateAttr(default=None)
+    _full: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+
+    @classmethod
+    def lazy(
+        cls,
+        type: str,
+        message: str,
+        build: Callable[[], Dict[str, Any]],
+        brief: Optional[Callable[[], Dict[str, Any]]] = None,
+        **data: Any,
+    ) -> "Event":
+        # `data` is cheap and stored as is; `build` returns the full remaining payload and
+        # `brief` its small form for summary verbosity (nothing when omitted)
+        event = cls(type=type, message=message, data=data)  # type: ignore[arg-type]
+        event._build = build
+        event._brief = brief
+        return event
+
+    def payload(self) -> Dict[str, Any]:
+        # The complete payload; deferred parts are built once and cached
+        if self._build is None:
+            return self.data
+        if self._full is None:
+            self._full = {**self._build(), **self.data}
+        return self._full
+
+    def summary(self) -> "Event":
+        # This event with the brief payload instead of the full one; events that were not
+        # created lazily (e.g. replayed from the task store) are returned unchanged
+        if self._build is None:
+            return self
+        brief = self._brief() if self._brief is not None else {}
+        return Event(type=self.type, message=self.message, data={**brief, **self.data})
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler: Any, info: Any) -> Any:
+        out = handler(self)
+        if self._build is not None and "data" in out:
+            payload = self.payload()
+            out["data"] = to_jsonable_python(payload) if info.mode_is_json() else payload
+        return out
+
+    def __eq__(self, other: object) -> bool:
+        # Equal when the complete events are, however their payloads were produced
+        if not isinstance(other, Event):
+            return NotImplemented
+        mine = (self.type, self.message, self.payload())
+        return mine == (other.type, other.message, other.payload())
+
 
 class Task(BaseModel):
     id: str
     agent_id: str
     input: TaskInput
+    # Absolute deadline (epoch seconds); inherited by delegated steps and sent to remote agents
+    deadline: Optional[float] = None
+    # W3C traceparent of the enclosing span, so each step's span joins the run's trace
+    trace_parent: Optional[str] = None
+    # LLM scheduling class: "interactive" (default) or "bulk"; inherited by delegated steps
+    priority: Optional[str] = None
+
+    def brief(self) -> Dict[str, Any]:
+        # The task without its logs and context, for "summary" event verbosity
+        data = self.model_dump(exclude={"input": {"logs", "context"}})
+        data["input"]["log_chars"] = len(self.input.logs)
+        data["input"]["context_keys"] = sorted(self.input.context or {})
+        return data
 
 
 class Delegation(BaseModel):
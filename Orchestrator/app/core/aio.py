@@ -0,0 +1,39 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Coroutine, Generator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    # One long-lived loop per process so pooled async clients outlive a single sync call
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="a2a-loop", daemon=True)
+            thread.start()
+            _LOOP = loop
+        return _LOOP
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result()
+
+
+def iterate_sync(agen: AsyncIterator[T]) -> Generator[T, None, None]:
+    # Drive an async generator from sync code, one item at a time, on the background loop
+    try:
+        while True:
+            try:
+                item = run_sync(agen.__anext__())  # type: ignore[arg-type]
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(agen, "aclose", None)
+        if aclose is not None:
+            run_sync(aclose())
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterator, List, Optional
+
+from app.core.llm_scheduler import count_batched
+
+# Deterministic stand-in for genai.GenerativeModel, used by benchmarks and load tests.
+# Enable with A2A_LLM_BACKEND=fake; no API key or network access is needed.
+#
+# Latency, token rate and output length can be fixed numbers or distributions, written
+# as "fixed:200", "uniform:100,400", "normal:250,50" or "lognormal:200,0.5" (median, sigma).
+# Samples are drawn from an RNG seeded by A2A_FAKE_LLM_SEED and the prompt, so a rerun of
+# the same workload sees the same latencies.
+#   A2A_FAKE_LLM_LATENCY      time to first token in ms (default A2A_FAKE_LLM_LATENCY_MS or 200)
+#   A2A_FAKE_LLM_TOKENS_PER_S output rate; 0 = everything at once (default 0)
+#   A2A_FAKE_LLM_TOKENS       output tokens (default 40)
+#   A2A_FAKE_LLM_ESCALATE     share of answers that recommend an RMA, i.e. make Fixer
+#                             escalate to Support (default 0)
+#   A2A_FAKE_LLM_QUOTA_RPM    calls per trailing minute before 429 quota errors (0 = no quota)
+# Micro-batched prompts (see app.core.llm_scheduler) are answered with a JSON array.
+
+
+class Distribution:
+    def __init__(self, kind: str, params: List[float]):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "Distribution":
+        kind, _, args = str(spec).partition(":")
+        if not args:
+            kind, args = "fixed", kind
+        params = [float(p) for p in args.split(",") if p.strip()]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown distribution: {spec}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(p[0]), p[1])
+        return p[0]
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+def _distribution(value, env_name: str, default: str) -> Distribution:
+    # Explicit argument (number or spec), else the environment, else the default
+    if isinstance(value, Distribution):
+        return value
+    if value is not None:
+        return Distribution.parse(str(value))
+    return Distribution.parse(os.getenv(env_name) or default)
+
+
+class FakeQuotaError(Exception):
+    # Mirrors google.api_core.exceptions.ResourceExhausted
+    code = 429
+
+
+class _Quota:
+    # Calls in the trailing minute, shared by every fake model in the process
+    def __init__(self) -> None:
+        self.calls: Deque[float] = deque()
+        self.lock = threading.Lock()
+
+    def check(self, rpm: float) -> None:
+        if rpm <= 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            while self.calls and now - self.calls[0] >= 60:
+                self.calls.popleft()
+            if len(self.calls) >= rpm:
+                retry_in = 60 - (now - self.calls[0])
+                raise FakeQuotaError(
+                    "429 Resource has been exhausted (e.g. check quota). "
+                    f"Please retry in {retry_in:.1f}s"
+                )
+            self.calls.append(now)
+
+
+_QUOTA = _Quota()
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+_WORDS = [
+    "Check", "cabling,", "reboot", "camera,", "verify", "RTSP", "settings,", "update", "firmware."
+]
+
+
+class FakeGenerativeModel:
+    def __init__(
+        self,
+        model_name: str,
+        system_instruction: str = "",
+        latency_ms=None,
+        tokens_per_s=None,
+        output_tokens=None,
+        escalate_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        default_latency = os.getenv("A2A_FAKE_LLM_LATENCY_MS", "200")
+        self.latency_ms = _distribution(latency_ms, "A2A_FAKE_LLM_LATENCY", default_latency)
+        self.tokens_per_s = _distribution(tokens_per_s, "A2A_FAKE_LLM_TOKENS_PER_S", "0")
+        self.output_tokens = _distribution(output_tokens, "A2A_FAKE_LLM_TOKENS", "40")
+        if escalate_rate is None:
+            escalate_rate = float(os.getenv("A2A_FAKE_LLM_ESCALATE", "0"))
+        self.escalate_rate = escalate_rate
+        self.seed = seed if seed is not None else int(os.getenv("A2A_FAKE_LLM_SEED", "0"))
+        self.quota_rpm = float(os.getenv("A2A_FAKE_LLM_QUOTA_RPM", "0"))
+
+    def _plan(self, prompt: str):
+        # (first-token delay s, per-token delay s, tokens), all derived from the prompt
+        seed_text = f"{self.seed}\n{self.system_instruction}\n{prompt}"
+        rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).digest())
+        batched = count_batched(prompt)
+        if batched:
+            answers = ["".join(self._answer(rng)).strip() for _ in range(batched)]
+            tokens = [json.dumps(answers)]
+        else:
+            tokens = self._answer(rng)
+        rate = self.tokens_per_s.sample(rng)
+        return self.latency_ms.sample(rng) / 1000, (1.0 / rate if rate > 0 else 0.0), tokens
+
+    def _answer(self, rng: random.Random) -> List[str]:
+        count = max(1, int(round(self.output_tokens.sample(rng))))
+        tokens = [f"{_WORDS[rng.randrange(len(_WORDS))]} " for _ in range(count)]
+        if rng.random() < self.escalate_rate:
+            tokens.append("Hardware fault suspected; request an RMA. ")
+        return tokens
+
+    def _response(self, prompt: str, text: str) -> FakeResponse:
+        return FakeResponse(text, FakeUsage(len(prompt) // 4, len(text.split())))
+
+    def _stream(
+        self, first_delay: float, token_delay: float, tokens: List[str]
+    ) -> Iterator[FakeResponse]:
+        time.sleep(first_delay)
+        for token in tokens:
+            if token_delay:
+                time.sleep(token_delay)
+            yield FakeResponse(token)
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        _QUOTA.check(self.quota_rpm)
+        first_delay, token_delay, tokens = self._plan(prompt)
+        if stream:
+            return self._stream(first_delay, token_delay, tokens)
+        time.sleep(first_delay + token_delay * len(tokens))
+        return self._response(prompt, "".join(tokens))
+
+    async def generate_content_async(self, prompt: str, **kwargs) -> FakeResponse:
+        _QUOTA.check(self.quota_rpm)
+        first_delay, token_delay, tokens = self._plan(prompt)
+        await asyncio.sleep(first_delay + token_delay * len(tokens))
+        return self._response(prompt, "".join(tokens))
+
+
+def fake_model_factory(model_name: str, system_instruction: str) -> FakeGenerativeModel:
+    return FakeGenerativeModel(model_name, system_instruction)
@@ -1,39 +1,319 @@
+import asyncio
 import os
-from typing import List
-import google.generativeai as genai
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.core.llm_cache import ResponseCache, cache_from_env, cache_key
+from app.core import tracing
+from app.core.llm_scheduler import get_scheduler
+from app.core.metrics import METRICS
 try:
     from dotenv import load_dotenv  # type: ignore
 except Exception:
     load_dotenv = None
 
+DEFAULT_MODEL = "gemini-1.5-flash"
+FALLBACK_MARKER = "[MOCKED GEMINI RESPONSE]"
 
-def get_gemini_model(model_name: str = "gemini-1.5-flash", system_instruction: str = ""):
-    if load_dotenv:
-        try:
-            load_dotenv()
-        except Exception:
-            pass
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return None
-    genai.configure(api_key=api_key)
+_UNSET = object()
+_RESPONSE_CACHE = _UNSET
+
+ModelFactory = Callable[[str, str], Any]
+
+
+def _genai() -> Any:
+    # The SDK is most of a cold start (~0.8 s of imports), so it is only loaded once a real
+    # model is configured; the fake backend and the no-key fallback never import it
+    import google.generativeai as genai
+
+    return genai
+
+
+def _genai_factory(model_name: str, system_instruction: str) -> Any:
+    genai = _genai()
     if system_instruction:
         return genai.GenerativeModel(model_name, system_instruction=system_instruction)
     return genai.GenerativeModel(model_name)
 
 
-def generate_text(prompt: str, system_instruction: str = "") -> str:
-    model = get_gemini_model(system_instruction=system_instruction)
+class ModelRegistry:
+    # Configures the SDK once and memoizes GenerativeModel objects per (model, system instruction).
+    # The lock is never held across an await, so it is safe from both threads and coroutines.
+    def __init__(self, factory: ModelFactory = _genai_factory, requires_api_key: bool = True):
+        self.factory = factory
+        self.requires_api_key = requires_api_key
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+        self._configured = False
+        self._api_key: Optional[str] = None
+
+    def configure(self, api_key: Optional[str] = None) -> bool:
+        with self._lock:
+            return self._configure_locked(api_key)
+
+    def _configure_locked(self, api_key: Optional[str] = None) -> bool:
+        if not self.requires_api_key:
+            self._configured = True
+            return True
+        if self._configured and api_key is None:
+            return self._api_key is not None
+        if api_key is None:
+            if load_dotenv:
+                try:
+                    load_dotenv()
+                except Exception:
+                    pass
+            api_key = os.getenv("GEMINI_API_KEY")
+        self._api_key = api_key or None
+        if self._api_key:
+            _genai().configure(api_key=self._api_key)
+        self._models.clear()
+        self._configured = True
+        return self._api_key is not None
+
+    def get(self, model_name: str = DEFAULT_MODEL, system_instruction: str = "") -> Any:
+        key = (model_name, system_instruction)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            if not self._configure_locked():
+                return None
+            model = self._models.get(key)
+            if model is None:
+                model = self.factory(model_name, system_instruction)
+                self._models[key] = model
+            return model
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._configured = False
+            self._api_key = None
+
+
+def _registry_from_env() -> ModelRegistry:
+    # A2A_LLM_BACKEND=fake swaps in the local fake model (benchmarks, load tests)
+    if os.getenv("A2A_LLM_BACKEND", "").lower() == "fake":
+        from app.core.fake_llm import fake_model_factory
+
+        return ModelRegistry(fake_model_factory, requires_api_key=False)
+    return ModelRegistry()
+
+
+MODELS = _registry_from_env()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is _UNSET:
+        _RESPONSE_CACHE = cache_from_env()
+    return _RESPONSE_CACHE  # type: ignore[return-value]
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    global _RESPONSE_CACHE
+    _RESPONSE_CACHE = cache
+
+
+def get_gemini_model(model_name: str = DEFAULT_MODEL, system_instruction: str = ""):
+    return MODELS.get(model_name, system_instruction)
+
+
+def _cache_lookup(
+    use_cache: bool, model_name: str, system_instruction: str, prompt: str
+) -> Tuple[Optional[ResponseCache], str, Optional[str]]:
+    cache = get_response_cache() if use_cache else None
+    if cache is None:
+        return None, "", None
+    key = cache_key(model_name, system_instruction, prompt)
+    cached = cache.get(key)
+    METRICS.incr("llm_cache_hits" if cached is not None else "llm_cache_misses")
+    return cache, key, cached
+
+
+def cached_text(
+    prompt: str, system_instruction: str = "", model_name: str = DEFAULT_MODEL
+) -> Optional[str]:
+    # A response-cache hit for this prompt without calling the model (None on a miss)
+    return _cache_lookup(True, model_name, system_instruction, prompt)[2]
+
+
+def _record_call(
+    model_name: str, prompt: str, text: str, started: float, response: Any = None
+) -> None:
+    # Token counts come from the response's usage metadata when present, else ~4 chars/token
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or len(prompt) // 4
+    output_tokens = getattr(usage, "candidates_token_count", None) or len(text) // 4
+    METRICS.observe("llm_request_seconds", time.perf_counter() - started, model=model_name)
+    METRICS.incr("llm_prompt_tokens", prompt_tokens, model=model_name)
+    METRICS.incr("llm_output_tokens", output_tokens, model=model_name)
+
+
+def _fallback(prompt: str, exc: Exception, model_name: str = DEFAULT_MODEL) -> str:
+    # Fallback text is never cached so the real answer is fetched once the API recovers
+    METRICS.incr("llm_errors", model=model_name)
+    return (
+        f"{FALLBACK_MARKER}\n"
+        "This is a POC fallback response due to missing key or API error.\n"
+        f"Prompt digest: {prompt[:120]}...\n"
+        f"Note: {exc}"
+    )
+
+
+def is_fallback(text: str) -> bool:
+    return text.startswith(FALLBACK_MARKER)
+
+
+def contains_fallback(value: Any) -> bool:
+    # Fallback text anywhere in a value: a result's summary, its details, or context
+    # propagated from an earlier step that fell back
+    if isinstance(value, str):
+        return FALLBACK_MARKER in value
+    if isinstance(value, dict):
+        return any(contains_fallback(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(contains_fallback(v) for v in value)
+    return False
+
+
+def generate_text_stream(
+    prompt: str,
+    system_instruction: str = "",
+    use_cache: bool = True,
+    model_name: str = DEFAULT_MODEL,
+) -> Iterator[str]:
+    cache, key, cached = _cache_lookup(use_cache, model_name, system_instruction, prompt)
+    if cached is not None:
+        yield cached
+        return
+    model = get_gemini_model(model_name=model_name, system_instruction=system_instruction)
+    scheduler = get_scheduler()
+    parts: List[str] = []
+    attempt = 0
+    span = tracing.start_span("llm.generate", model=model_name, stream=True)
+    try:
+        while True:
+            try:
+                if model is None:
+                    raise RuntimeError("GEMINI_API_KEY not configured; using mock response")
+                ticket = scheduler.acquire(prompt)
+                started = time.perf_counter()
+                for chunk in model.generate_content(prompt, stream=True):
+                    piece = chunk.text or ""
+                    if not parts:
+                        piece = piece.lstrip()
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                        span.set_attribute("ttft_ms", ttft_ms)
+                    if piece:
+                        parts.append(piece)
+                        yield piece
+                scheduler.settle(ticket)
+                break
+            except Exception as exc:  # noqa: BLE001
+                # Quota errors before the first chunk are retried; nothing was shown yet
+                delay = None if parts else scheduler.retry_delay(exc, attempt, model_name)
+                if delay is not None:
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                span.record_error(exc)
+                if not parts:
+                    yield _fallback(prompt, exc, model_name)
+                else:
+                    yield f"\n[stream interrupted: {exc}]"
+                return
+    finally:
+        span.end()
+    _record_call(model_name, prompt, "".join(parts), started)
+    if cache is not None:
+        cache.set(key, "".join(parts).strip())
+
+
+def generate_text(
+    prompt: str,
+    system_instruction: str = "",
+    use_cache: bool = True,
+    model_name: str = DEFAULT_MODEL,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> str:
+    if on_delta is not None:
+        parts: List[str] = []
+        for piece in generate_text_stream(prompt, system_instruction, use_cache, model_name):
+            parts.append(piece)
+            on_delta(piece)
+        return "".join(parts).strip()
+    cache, key, cached = _cache_lookup(use_cache, model_name, system_instruction, prompt)
+    if cached is not None:
+        return cached
+    model = get_gemini_model(model_name=model_name, system_instruction=system_instruction)
+    started = time.perf_counter()
+
+    def send() -> Any:
+        nonlocal started
+        started = time.perf_counter()
+        # Use single prompt; system_instruction is already bound to the model
+        return model.generate_content(prompt)
+
+    with tracing.span("llm.generate", model=model_name) as span:
+        try:
+            if model is None:
+                raise RuntimeError("GEMINI_API_KEY not configured; using mock response")
+            response = get_scheduler().call(prompt, send, model_name)
+            text = (response.text or "").strip()
+        except Exception as exc:  # noqa: BLE001
+            span.record_error(exc)
+            return _fallback(prompt, exc, model_name)
+    _record_call(model_name, prompt, text, started, response)
+    if cache is not None:
+        cache.set(key, text)
+    return text
+
+
+async def _agenerate(model: Any, model_name: str, prompt: str) -> str:
+    # One scheduled request; spans and metrics describe what was actually sent
+    started = time.perf_counter()
+
+    async def send() -> Any:
+        nonlocal started
+        started = time.perf_counter()
+        if hasattr(model, "generate_content_async"):
+            return await model.generate_content_async(prompt)
+        # Custom factories may only provide the blocking call
+        return await asyncio.to_thread(model.generate_content, prompt)
+
+    with tracing.span("llm.generate", model=model_name):
+        response = await get_scheduler().call_async(prompt, send, model_name)
+        text = (response.text or "").strip()
+    _record_call(model_name, prompt, text, started, response)
+    return text
+
+
+async def generate_text_async(
+    prompt: str,
+    system_instruction: str = "",
+    use_cache: bool = True,
+    model_name: str = DEFAULT_MODEL,
+) -> str:
+    cache, key, cached = _cache_lookup(use_cache, model_name, system_instruction, prompt)
+    if cached is not None:
+        return cached
+    model = get_gemini_model(model_name=model_name, system_instruction=system_instruction)
+    batcher = get_scheduler().batcher
     try:
         if model is None:
             raise RuntimeError("GEMINI_API_KEY not configured; using mock response")
-        # Use single prompt; system_instruction is already bound to the model
-        response = model.generate_content(prompt)
-        return (response.text or "").strip()
+        if batcher.accepts(prompt):
+            text = await batcher.submit(
+                (model_name, system_instruction),
+                prompt,
+                lambda batch_prompt: _agenerate(model, model_name, batch_prompt),
+            )
+        else:
+            text = await _agenerate(model, model_name, prompt)
     except Exception as exc:  # noqa: BLE001
-        return (
-            "[MOCKED GEMINI RESPONSE]\n"
-            "This is a POC fallback response due to missing key or API error.\n"
-            f"Prompt digest: {prompt[:120]}...\n"
-            f"Note: {exc}"
-        )
+        return _fallback(prompt, exc, model_name)
+    if cache is not None:
+        cache.set(key, text)
+    return text
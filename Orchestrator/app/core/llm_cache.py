@@ -0,0 +1,157 @@
+import abc
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+_DEFAULT_DISK_PATH = os.path.join(".a2a", "llm_cache.sqlite")
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Whitespace-only differences (trailing spaces, CRLF, blank lines) should share an entry
+    return " ".join(prompt.split())
+
+
+def cache_key(model_name: str, system_instruction: str, prompt: str) -> str:
+    payload = json.dumps([model_name, system_instruction.strip(), normalize_prompt(prompt)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(abc.ABC):
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(ResponseCache):
+    def __init__(self, path: str = _DEFAULT_DISK_PATH, max_entries: int = 100_000, ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+
+class TieredCache(ResponseCache):
+    # Reads fall through the tiers in order and promote hits into the faster tiers
+    def __init__(self, tiers: List[ResponseCache]):
+        self.tiers = tiers
+
+    def get(self, key: str) -> Optional[str]:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    mode = os.getenv("A2A_LLM_CACHE", "memory").lower()
+    if mode in ("", "0", "off", "none", "false"):
+        return None
+    ttl_raw = os.getenv("A2A_LLM_CACHE_TTL", "86400")
+    ttl = float(ttl_raw) if ttl_raw else None
+    memory = MemoryCache(max_entries=int(os.getenv("A2A_LLM_CACHE_MAX_ENTRIES", "1024")), ttl=ttl)
+    if mode == "memory":
+        return memory
+    disk = SQLiteCache(
+        path=os.getenv("A2A_LLM_CACHE_PATH", _DEFAULT_DISK_PATH),
+        max_entries=int(os.getenv("A2A_LLM_CACHE_MAX_DISK_ENTRIES", "100000")),
+        ttl=ttl,
+    )
+    if mode == "sqlite":
+        return disk
+    return TieredCache([memory, disk])
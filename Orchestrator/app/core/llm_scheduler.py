@@ -0,0 +1,504 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.core.metrics import METRICS
+
+# Process-wide admission for LLM calls, shared by every agent in the process.
+#   A2A_LLM_RPM / A2A_LLM_TPM   requests / tokens per minute; 0 = unlimited (default)
+#   A2A_LLM_OUTPUT_TOKENS       output tokens reserved per call until the real count is known (256)
+#   A2A_LLM_QUOTA_RETRIES       retries after a quota (429) error (default 3)
+#   A2A_LLM_QUOTA_BACKOFF       first retry delay in seconds, doubled per retry (default 2)
+#   A2A_LLM_BATCH_WINDOW_MS     micro-batching window for short prompts; 0 = off (default)
+#   A2A_LLM_BATCH_MAX           prompts per batch (default 8)
+#   A2A_LLM_BATCH_MAX_CHARS     longer prompts are never batched (default 4000)
+#   A2A_LLM_BATCH_AGENTS        agents whose prompts may be batched (default "diagnoser")
+# Waiting calls are served strictly by priority class (interactive before bulk) and
+# round-robin across agents within a class, so one agent's burst cannot starve the others.
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+PRIORITY_HEADER = "X-A2A-Priority"
+
+_AGENT: ContextVar[str] = ContextVar("a2a_llm_agent", default="default")
+_PRIORITY: ContextVar[str] = ContextVar("a2a_llm_priority", default=INTERACTIVE)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_priority(value: Optional[str]) -> str:
+    value = (value or "").strip().lower()
+    return value if value in PRIORITIES else INTERACTIVE
+
+
+@contextmanager
+def caller(agent: Optional[str] = None, priority: Optional[str] = None) -> Iterator[None]:
+    # Tags LLM calls made inside the block, including worker threads and tasks started from it
+    tokens = []
+    if agent is not None:
+        tokens.append((_AGENT, _AGENT.set(agent)))
+    if priority is not None:
+        tokens.append((_PRIORITY, _PRIORITY.set(normalize_priority(priority))))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_caller() -> Tuple[str, str]:
+    return _AGENT.get(), _PRIORITY.get()
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    # google.api_core ResourceExhausted / TooManyRequests, or any error that reads like a 429
+    if getattr(exc, "code", None) == 429:
+        return True
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    text = str(exc).lower()
+    return "429" in text or "quota" in text or "rate limit" in text
+
+
+_RETRY_HINT = re.compile(r"retry(?: in|_delay \{ seconds:)\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def _suggested_delay(exc: BaseException) -> Optional[float]:
+    # Gemini quota errors carry "Please retry in 12.3s" / "retry_delay { seconds: 12 }"
+    match = _RETRY_HINT.search(str(exc))
+    return float(match.group(1)) if match else None
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _used_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    if total:
+        return int(total)
+    prompt = getattr(usage, "prompt_token_count", None)
+    output = getattr(usage, "candidates_token_count", None)
+    if prompt is not None or output is not None:
+        return int(prompt or 0) + int(output or 0)
+    return None
+
+
+class TokenBucket:
+    # `per_minute` units refill continuously; bursts of up to one minute's worth are allowed
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float) -> None:
+        # Return unused reservation (or charge more, with a negative amount)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    def __init__(self, agent: str, priority: str, tokens: int):
+        self.agent = agent
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.waited = 0.0
+        self.granted = False
+        self.signal: Callable[[], None] = lambda: None
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        output_tokens: int = 256,
+        retries: int = 3,
+        backoff: float = 2.0,
+        batcher: Optional["MicroBatcher"] = None,
+    ):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.output_tokens = output_tokens
+        self.retries = retries
+        self.backoff = backoff
+        self.batcher = batcher or MicroBatcher()
+        self._queues: Dict[str, "OrderedDict[str, Deque[Ticket]]"] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            rpm=_env_float("A2A_LLM_RPM", 0),
+            tpm=_env_float("A2A_LLM_TPM", 0),
+            output_tokens=int(_env_float("A2A_LLM_OUTPUT_TOKENS", 256)),
+            retries=int(_env_float("A2A_LLM_QUOTA_RETRIES", 3)),
+            backoff=_env_float("A2A_LLM_QUOTA_BACKOFF", 2.0),
+            batcher=MicroBatcher.from_env(),
+        )
+
+    @property
+    def limited(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _ticket(self, prompt: str) -> Ticket:
+        agent, priority = current_caller()
+        return Ticket(agent, priority, estimate_tokens(prompt) + self.output_tokens)
+
+    # --- queue (all *_locked methods run under self._lock) ---
+
+    def _head_locked(self) -> Optional[Ticket]:
+        for priority in PRIORITIES:
+            agents = self._queues[priority]
+            if agents:
+                return next(iter(agents.values()))[0]
+        return None
+
+    def _remove_locked(self, ticket: Ticket, rotate: bool) -> None:
+        agents = self._queues[ticket.priority]
+        queue = agents.get(ticket.agent)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        if rotate or not queue:
+            # Served agent goes to the back of the round-robin
+            del agents[ticket.agent]
+            if queue:
+                agents[ticket.agent] = queue
+        self._publish_depth_locked(ticket.priority, ticket.agent)
+
+    def _publish_depth_locked(self, priority: str, agent: str) -> None:
+        depth = len(self._queues[priority].get(agent) or ())
+        METRICS.set("llm_queue_depth", depth, priority=priority, agent=agent)
+
+    def _wait_locked(self, ticket: Ticket, now: float) -> float:
+        wait = max(0.0, self._paused_until - now)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(ticket.tokens, now))
+        return wait
+
+    def _dispatch_locked(self) -> float:
+        # Grants queued tickets in order while the buckets allow; returns how long the head
+        # of the queue still has to wait (0 when the queue is empty)
+        while True:
+            head = self._head_locked()
+            if head is None:
+                return 0.0
+            now = time.monotonic()
+            wait = self._wait_locked(head, now)
+            if wait > 0:
+                return wait
+            if self.requests is not None:
+                self.requests.take(1, now)
+            if self.tokens is not None:
+                self.tokens.take(head.tokens, now)
+            self._remove_locked(head, rotate=True)
+            head.granted = True
+            head.waited = now - head.enqueued
+            METRICS.observe(
+                "llm_queue_wait_seconds", head.waited, priority=head.priority, agent=head.agent
+            )
+            head.signal()
+
+    def _enqueue(self, ticket: Ticket) -> float:
+        with self._lock:
+            agents = self._queues[ticket.priority]
+            agents.setdefault(ticket.agent, deque()).append(ticket)
+            self._publish_depth_locked(ticket.priority, ticket.agent)
+            return self._dispatch_locked()
+
+    def _poll(self) -> float:
+        with self._lock:
+            return self._dispatch_locked()
+
+    def _abandon(self, ticket: Ticket) -> None:
+        # The caller gave up (cancelled, deadline); hand back its reservation if it had one
+        with self._lock:
+            if ticket.granted:
+                self._refund_locked(ticket.tokens, requests=1)
+            else:
+                self._remove_locked(ticket, rotate=False)
+            self._dispatch_locked()
+
+    def _refund_locked(self, tokens: int, requests: int = 0) -> None:
+        if self.tokens is not None:
+            self.tokens.give(tokens)
+        if self.requests is not None and requests:
+            self.requests.give(requests)
+
+    # --- admission ---
+
+    def acquire(self, prompt: str) -> Ticket:
+        ticket = self._ticket(prompt)
+        if not self.limited:
+            return ticket
+        event = threading.Event()
+        ticket.signal = event.set
+        hint = self._enqueue(ticket)
+        try:
+            while not event.wait(min(max(hint, 0.001), 1.0)):
+                hint = self._poll()
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        return ticket
+
+    async def acquire_async(self, prompt: str) -> Ticket:
+        ticket = self._ticket(prompt)
+        if not self.limited:
+            return ticket
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def resolve() -> None:
+            if not granted.done():
+                granted.set_result(None)
+
+        ticket.signal = lambda: loop.call_soon_threadsafe(resolve)
+        hint = self._enqueue(ticket)
+        try:
+            while not granted.done():
+                await asyncio.wait({granted}, timeout=min(max(hint, 0.001), 1.0))
+                if not granted.done():
+                    hint = self._poll()
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        return ticket
+
+    def settle(self, ticket: Ticket, response: Any = None) -> None:
+        # Replace the up-front token estimate with the real count once it is known
+        used = _used_tokens(response) if response is not None else None
+        if used is None or self.tokens is None:
+            return
+        with self._lock:
+            self._refund_locked(ticket.tokens - used)
+
+    def retry_delay(self, exc: BaseException, attempt: int, model_name: str) -> Optional[float]:
+        # Seconds to wait before retrying a quota error, or None when the error is final.
+        # The quota is shared, so every queued caller is held back for the same period.
+        if attempt >= self.retries or not is_quota_error(exc):
+            return None
+        delay = _suggested_delay(exc)
+        if delay is None:
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        METRICS.incr("llm_quota_retries", model=model_name)
+        return delay
+
+    def call(self, prompt: str, send: Callable[[], Any], model_name: str) -> Any:
+        attempt = 0
+        while True:
+            ticket = self.acquire(prompt)
+            try:
+                response = send()
+            except Exception as exc:  # noqa: BLE001
+                delay = self.retry_delay(exc, attempt, model_name)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.settle(ticket, response)
+            return response
+
+    async def call_async(
+        self, prompt: str, send: Callable[[], Awaitable[Any]], model_name: str
+    ) -> Any:
+        attempt = 0
+        while True:
+            ticket = await self.acquire_async(prompt)
+            try:
+                response = await send()
+            except Exception as exc:  # noqa: BLE001
+                delay = self.retry_delay(exc, attempt, model_name)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.settle(ticket, response)
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            depth = {
+                priority: {agent: len(queue) for agent, queue in agents.items()}
+                for priority, agents in self._queues.items()
+            }
+            paused = max(0.0, self._paused_until - time.monotonic())
+        return {"queued": depth, "paused_s": round(paused, 3)}
+
+
+# Micro-batching: short prompts with the same model and system instruction that arrive within
+# one window are sent as a single request asking for a JSON array of answers. If the reply
+# cannot be split, each prompt is sent on its own, so batching never changes what callers get.
+
+BATCH_PREFIX = "Answer each of the following independent requests separately."
+_BATCH_ITEM = re.compile(r"^### Request (\d+)$", re.MULTILINE)
+
+
+def combine_prompts(prompts: List[str]) -> str:
+    parts = [
+        BATCH_PREFIX,
+        f"Reply with only a JSON array of {len(prompts)} strings: answer i for request i.",
+    ]
+    for n, prompt in enumerate(prompts, start=1):
+        parts.append(f"### Request {n}\n{prompt}")
+    return "\n\n".join(parts)
+
+
+def count_batched(prompt: str) -> int:
+    # Number of requests in a combined prompt (0 if it is not one)
+    if not prompt.startswith(BATCH_PREFIX):
+        return 0
+    return len(_BATCH_ITEM.findall(prompt))
+
+
+def split_answers(text: str, count: int) -> Optional[List[str]]:
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return None
+    try:
+        answers = json.loads(text[start : end + 1])
+    except ValueError:
+        return None
+    if not isinstance(answers, list) or len(answers) != count:
+        return None
+    if not all(isinstance(answer, str) for answer in answers):
+        return None
+    return [answer.strip() for answer in answers]
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.items: List[Tuple[str, "asyncio.Future[str]"]] = []
+        self.sent = False
+
+
+class MicroBatcher:
+    # Async callers only; one open batch per (event loop, model, system instruction)
+    def __init__(
+        self,
+        window_ms: float = 0,
+        max_size: int = 8,
+        max_chars: int = 4000,
+        agents: Tuple[str, ...] = ("diagnoser",),
+    ):
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self.max_chars = max_chars
+        self.agents = agents
+        self._open: Dict[Tuple[int, Any], _Batch] = {}
+
+    @classmethod
+    def from_env(cls) -> "MicroBatcher":
+        agents = os.getenv("A2A_LLM_BATCH_AGENTS", "diagnoser")
+        return cls(
+            window_ms=_env_float("A2A_LLM_BATCH_WINDOW_MS", 0),
+            max_size=int(_env_float("A2A_LLM_BATCH_MAX", 8)),
+            max_chars=int(_env_float("A2A_LLM_BATCH_MAX_CHARS", 4000)),
+            agents=tuple(a.strip() for a in agents.split(",") if a.strip()),
+        )
+
+    def accepts(self, prompt: str) -> bool:
+        if self.window <= 0 or self.max_size < 2 or len(prompt) > self.max_chars:
+            return False
+        return current_caller()[0] in self.agents
+
+    async def submit(
+        self, key: Any, prompt: str, send: Callable[[str], Awaitable[str]]
+    ) -> str:
+        loop = asyncio.get_running_loop()
+        batch_key = (id(loop), key)
+        batch = self._open.get(batch_key)
+        if batch is None:
+            batch = self._open[batch_key] = _Batch()
+            loop.call_later(self.window, self._flush, batch_key, batch, send)
+        answer: "asyncio.Future[str]" = loop.create_future()
+        batch.items.append((prompt, answer))
+        if len(batch.items) >= self.max_size:
+            self._flush(batch_key, batch, send)
+        return await answer
+
+    def _flush(self, batch_key: Tuple[int, Any], batch: _Batch, send) -> None:
+        if self._open.get(batch_key) is batch:
+            del self._open[batch_key]
+        if not batch.sent:
+            batch.sent = True
+            asyncio.ensure_future(self._send(batch, send))
+
+    async def _send(self, batch: _Batch, send: Callable[[str], Awaitable[str]]) -> None:
+        prompts = [prompt for prompt, _ in batch.items]
+        answers: Optional[List[Any]] = None
+        if len(prompts) > 1:
+            METRICS.incr("llm_batches")
+            METRICS.incr("llm_batched_prompts", len(prompts))
+            try:
+                answers = split_answers(await send(combine_prompts(prompts)), len(prompts))
+            except Exception:  # noqa: BLE001
+                answers = None
+            if answers is None:
+                METRICS.incr("llm_batch_unsplit")
+        if answers is None:
+            answers = await asyncio.gather(*(send(p) for p in prompts), return_exceptions=True)
+        for (_, answer), outcome in zip(batch.items, answers):
+            if answer.done():
+                continue
+            if isinstance(outcome, BaseException):
+                answer.set_exception(outcome)
+            else:
+                answer.set_result(outcome)
+
+
+_SCHEDULER: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = LLMScheduler.from_env()
+    return _SCHEDULER
+
+
+def set_scheduler(scheduler: Optional[LLMScheduler]) -> None:
+    global _SCHEDULER
+    _SCHEDULER = scheduler
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
+
+from app.core.a2a_models import LogRef
+
+CHUNK_SIZE = 64 * 1024
+
+# Spooled uploads and chunk iterators are written here; override with A2A_LOG_SPOOL_DIR
+_SPOOL_DIR = os.getenv("A2A_LOG_SPOOL_DIR") or None
+
+
+def _spool_file():
+    return tempfile.NamedTemporaryFile("wb", prefix="a2a-log-", suffix=".log", dir=_SPOOL_DIR, delete=False)
+
+
+def spool_chunks(chunks: Iterable[Union[bytes, str]], encoding: str = "utf-8") -> LogRef:
+    # Turn a chunk iterator into a file-backed LogRef without holding the whole log in memory
+    size = 0
+    with _spool_file() as f:
+        for chunk in chunks:
+            data = chunk.encode(encoding) if isinstance(chunk, str) else chunk
+            f.write(data)
+            size += len(data)
+    return LogRef(path=f.name, encoding=encoding, size=size)
+
+
+async def spool_chunks_async(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> LogRef:
+    size = 0
+    with _spool_file() as f:
+        async for data in chunks:
+            f.write(data)
+            size += len(data)
+    return LogRef(path=f.name, encoding=encoding, size=size)
+
+
+def iter_file_chunks(ref: LogRef, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(ref.path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+
+async def aiter_file_chunks(ref: LogRef, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    with open(ref.path, "rb") as f:
+        while True:
+            data = await asyncio.to_thread(f.read, chunk_size)
+            if not data:
+                return
+            yield data
+
+
+def discard(ref: Optional[LogRef]) -> None:
+    if ref is None:
+        return
+    try:
+        os.unlink(ref.path)
+    except OSError:
+        pass
@@ -0,0 +1,121 @@
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# Seconds; covers card fetches (ms) through slow LLM calls (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _key(name: str, labels: Dict[str, str]) -> MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format(key: MetricKey, extra: Sequence[Tuple[str, str]] = (), suffix: str = "") -> str:
+    name, labels = key
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return name + suffix
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return f"{name}{suffix}{{{inner}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    # Process-wide counters, gauges and histograms; cheap enough to call on every request
+    def __init__(self) -> None:
+        self._counters: Dict[MetricKey, float] = {}
+        self._gauges: Dict[MetricKey, float] = {}
+        self._histograms: Dict[MetricKey, _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        # Gauge: last value wins (queue depths, in-flight counts)
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(
+        self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str
+    ) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def get(self, name: str, **labels: str) -> float:
+        key = _key(name, labels)
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0.0))
+
+    def snapshot(self) -> Dict[str, float]:
+        # Counters and gauges, plus _count/_sum for each histogram
+        with self._lock:
+            values = {_format(k): v for k, v in self._counters.items()}
+            values.update({_format(k): v for k, v in self._gauges.items()})
+            for key, histogram in self._histograms.items():
+                values[_format(key, suffix="_count")] = float(histogram.count)
+                values[_format(key, suffix="_sum")] = histogram.sum
+            return values
+
+    def render_prometheus(self) -> str:
+        # Prometheus text exposition format (version 0.0.4)
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for key in sorted(self._counters):
+                if key[0] not in typed:
+                    typed.add(key[0])
+                    lines.append(f"# TYPE {key[0]} counter")
+                lines.append(f"{_format(key)} {self._counters[key]:g}")
+            for key in sorted(self._gauges):
+                if key[0] not in typed:
+                    typed.add(key[0])
+                    lines.append(f"# TYPE {key[0]} gauge")
+                lines.append(f"{_format(key)} {self._gauges[key]:g}")
+            for key in sorted(self._histograms):
+                histogram = self._histograms[key]
+                if key[0] not in typed:
+                    typed.add(key[0])
+                    lines.append(f"# TYPE {key[0]} histogram")
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + [float("inf")], histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{_format(key, [('le', le)], '_bucket')} {cumulative}")
+                lines.append(f"{_format(key, suffix='_sum')} {histogram.sum:g}")
+                lines.append(f"{_format(key, suffix='_count')} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+METRICS = Metrics()
@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple, TypeVar
+
+from app.core.a2a_models import TaskInput
+from app.core.llm_cache import normalize_prompt
+from app.core.metrics import METRICS
+
+T = TypeVar("T")
+
+
+def coalesce_agents() -> Set[str]:
+    # Only agents without side effects are coalesced; Support files tickets per task
+    raw = os.getenv("A2A_COALESCE_AGENTS", "diagnoser,fixer")
+    return {name.strip() for name in raw.split(",") if name.strip()}
+
+
+def coalesce_key(agent_id: str, input_data: TaskInput) -> Optional[str]:
+    # Same agent + same normalized input => same answer. The idempotency key is per task and
+    # deliberately left out. Returns None when the agent must not be coalesced.
+    if agent_id not in coalesce_agents():
+        return None
+    payload: Dict[str, object] = {
+        "agent_id": agent_id,
+        "logs": hashlib.sha256(normalize_prompt(input_data.logs).encode("utf-8")).hexdigest(),
+        "context": input_data.context,
+    }
+    ref = input_data.log_ref
+    if ref is not None:
+        try:
+            stat = os.stat(ref.path)
+            payload["log_ref"] = [ref.path, stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            payload["log_ref"] = [ref.path]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one in-flight computation. The shared task is
+    # shielded, so a caller that gives up does not cancel it for the others.
+    def __init__(self, layer: str):
+        self.layer = layer
+        self._inflight: Dict[Tuple[int, str], "asyncio.Future"] = {}
+
+    async def do(
+        self, key: Optional[str], fn: Callable[[], Awaitable[T]], agent: str = ""
+    ) -> Tuple[T, bool]:
+        # Returns (result, coalesced); coalesced is True for callers that joined a running call
+        if key is None:
+            return await fn(), False
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)
+        shared = self._inflight.get(slot)
+        if shared is not None:
+            METRICS.incr("coalesced_requests", layer=self.layer, agent=agent)
+            return await asyncio.shield(shared), True
+        shared = asyncio.ensure_future(fn())
+        self._inflight[slot] = shared
+        shared.add_done_callback(lambda task: self._done(slot, task))
+        return await asyncio.shield(shared), False
+
+    def _done(self, slot: Tuple[int, str], task: "asyncio.Future") -> None:
+        if self._inflight.get(slot) is task:
+            self._inflight.pop(slot, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller gave up
+
+    def inflight(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,259 @@
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+# Spans around the orchestration path (execute -> agent hop -> remote call / agent run ->
+# LLM call), with W3C `traceparent` propagated over HTTP to the agent server.
+#
+# A2A_TRACE_EXPORTER: off (default) | console | file | otlp
+#   With the OpenTelemetry SDK installed, spans go through it (console/file use its
+#   ConsoleSpanExporter, otlp needs opentelemetry-exporter-otlp). Without the SDK,
+#   console/file use a small built-in recorder that writes one JSON object per span.
+#   A2A_TRACE_FILE sets the file path (default .a2a/traces.jsonl).
+# If the OpenTelemetry API is installed and the host application configured its own
+# provider, spans join that instead.
+try:
+    from opentelemetry import context as otel_context  # type: ignore
+    from opentelemetry import propagate as otel_propagate  # type: ignore
+    from opentelemetry import trace as otel_trace  # type: ignore
+except ImportError:  # pragma: no cover - optional
+    otel_trace = None
+
+_DEFAULT_FILE = os.path.join(".a2a", "traces.jsonl")
+TRACEPARENT = "traceparent"
+
+
+class _Recorder:
+    # Offline exporter used when the OpenTelemetry SDK is not installed
+    def __init__(self, out: TextIO):
+        self._out = out
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+
+
+class _BuiltinSpan:
+    def __init__(
+        self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.ended = False
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+_CURRENT: ContextVar[Optional[_BuiltinSpan]] = ContextVar("a2a_span", default=None)
+
+
+class Span:
+    # Thin handle over an OpenTelemetry span or a built-in one; a no-op when tracing is off
+    def __init__(self, otel_span: Any = None, builtin: Optional[_BuiltinSpan] = None):
+        self._otel = otel_span
+        self._builtin = builtin
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self._otel is not None:
+            self._otel.set_attribute(key, value)
+        elif self._builtin is not None:
+            self._builtin.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        if self._otel is not None:
+            self._otel.record_exception(exc)
+            self._otel.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, str(exc)))
+        elif self._builtin is not None:
+            self._builtin.status = "error"
+            self._builtin.error = f"{type(exc).__name__}: {exc}"
+
+    def traceparent(self) -> Optional[str]:
+        if self._otel is not None:
+            carrier: Dict[str, str] = {}
+            otel_propagate.inject(carrier, context=otel_trace.set_span_in_context(self._otel))
+            return carrier.get(TRACEPARENT)
+        if self._builtin is not None:
+            return self._builtin.traceparent()
+        return None
+
+    @contextmanager
+    def activate(self) -> Iterator["Span"]:
+        # Current for the duration of the block; keep blocks free of generator yields
+        if self._otel is not None:
+            token = otel_context.attach(otel_trace.set_span_in_context(self._otel))
+            try:
+                yield self
+            finally:
+                otel_context.detach(token)
+        elif self._builtin is not None:
+            token = _CURRENT.set(self._builtin)
+            try:
+                yield self
+            finally:
+                _CURRENT.reset(token)
+        else:
+            yield self
+
+    def end(self) -> None:
+        if self._otel is not None:
+            self._otel.end()
+            return
+        span = self._builtin
+        if span is None or span.ended or _RECORDER is None:
+            return
+        span.ended = True
+        _RECORDER.export(
+            {
+                "name": span.name,
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "start": span.start_wall,
+                "duration_ms": round((time.perf_counter() - span.start) * 1000, 3),
+                "status": span.status,
+                "error": span.error,
+                "attributes": span.attributes,
+            }
+        )
+
+
+NOOP_SPAN = Span()
+
+_MODE: Optional[str] = None  # "otel" | "builtin" | "off", decided on first use
+_RECORDER: Optional[_Recorder] = None
+_CONFIG_LOCK = threading.Lock()
+
+
+def _open_file(path: Optional[str]) -> TextIO:
+    path = path or os.getenv("A2A_TRACE_FILE", _DEFAULT_FILE)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "a", encoding="utf-8")
+
+
+def _configure_sdk(exporter: str, path: Optional[str]) -> bool:
+    try:
+        from opentelemetry.sdk.resources import Resource  # type: ignore
+        from opentelemetry.sdk.trace import TracerProvider  # type: ignore
+        from opentelemetry.sdk.trace.export import (  # type: ignore
+            BatchSpanProcessor,
+            ConsoleSpanExporter,
+        )
+    except ImportError:
+        return False
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter  # type: ignore
+
+        span_exporter = OTLPSpanExporter()
+    elif exporter == "file":
+        span_exporter = ConsoleSpanExporter(
+            out=_open_file(path), formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    else:
+        span_exporter = ConsoleSpanExporter()
+    service = os.getenv("OTEL_SERVICE_NAME", "a2a-orchestrator")
+    provider = TracerProvider(resource=Resource.create({"service.name": service}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    otel_trace.set_tracer_provider(provider)
+    return True
+
+
+def configure(exporter: Optional[str] = None, path: Optional[str] = None) -> str:
+    # Called lazily on the first span; call it explicitly to switch exporters (e.g. in tests)
+    global _MODE, _RECORDER
+    exporter = (exporter or os.getenv("A2A_TRACE_EXPORTER", "off")).lower()
+    with _CONFIG_LOCK:
+        _RECORDER = None
+        if exporter in ("console", "file", "otlp") and otel_trace is not None:
+            if _configure_sdk(exporter, path):
+                _MODE = "otel"
+                return _MODE
+        if exporter in ("console", "file"):
+            _RECORDER = _Recorder(sys.stderr if exporter == "console" else _open_file(path))
+            _MODE = "builtin"
+        else:
+            # The API alone is a no-op unless the host application installed a provider
+            _MODE = "otel" if otel_trace is not None else "off"
+        return _MODE
+
+
+def _mode() -> str:
+    return _MODE if _MODE is not None else configure()
+
+
+def _parse_traceparent(value: Optional[str]):
+    parts = (value or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None
+
+
+def start_span(name: str, parent: Optional[str] = None, **attributes: Any) -> Span:
+    # Not made current; `parent` is a W3C traceparent (e.g. from a Task or an HTTP header),
+    # otherwise the current span is the parent
+    mode = _mode()
+    if mode == "otel":
+        tracer = otel_trace.get_tracer("a2a")
+        ctx = otel_propagate.extract({TRACEPARENT: parent}) if parent else None
+        return Span(otel_span=tracer.start_span(name, context=ctx, attributes=attributes))
+    if mode == "builtin":
+        parsed = _parse_traceparent(parent)
+        current = _CURRENT.get()
+        if parsed is not None:
+            trace_id, parent_id = parsed
+        elif current is not None:
+            trace_id, parent_id = current.trace_id, current.span_id
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+        return Span(builtin=_BuiltinSpan(name, trace_id, parent_id, attributes))
+    return NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, parent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    current = start_span(name, parent, **attributes)
+    try:
+        with current.activate():
+            yield current
+    except BaseException as exc:
+        current.record_error(exc)
+        raise
+    finally:
+        current.end()
+
+
+def current_traceparent() -> Optional[str]:
+    mode = _mode()
+    if mode == "otel":
+        carrier: Dict[str, str] = {}
+        otel_propagate.inject(carrier)
+        return carrier.get(TRACEPARENT)
+    if mode == "builtin":
+        current = _CURRENT.get()
+        return current.traceparent() if current is not None else None
+    return None
+
+
+def inject(headers: Dict[str, str]) -> Dict[str, str]:
+    # Adds the current trace context to outgoing HTTP headers
+    value = current_traceparent()
+    if value:
+        headers[TRACEPARENT] = value
+    return headers
@@ -0,0 +1,224 @@
+import json
+import os
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Compact encodings between the executor and agent servers. JSON stays the default and
+# always works; msgpack and zstd are used only when installed on both ends
+# (pip install -e ".[wire]"). Either side learns what the other accepts from the
+# Accept/Accept-Encoding request headers and the Accept-Post/Accept-Encoding response
+# headers (RFC 7694).
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional
+    orjson = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover - optional
+    msgpack = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+COMPRESS_MIN_BYTES = int(os.getenv("A2A_WIRE_COMPRESS_MIN", "1024"))
+
+
+def _enabled(name: str) -> bool:
+    return os.getenv(name, "auto").lower() not in ("0", "off", "false", "json", "none")
+
+
+def media_types() -> List[str]:
+    # Preference order
+    types = [MSGPACK] if msgpack is not None and _enabled("A2A_WIRE_FORMAT") else []
+    return types + [JSON]
+
+
+def encodings() -> List[str]:
+    if not _enabled("A2A_WIRE_COMPRESSION"):
+        return []
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def dumps(payload: Any, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+def loads(body: bytes, media_type: str = JSON) -> Any:
+    if media_type == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        compressor = _gzip_compressor()
+        return compressor.compress(body) + compressor.flush()
+    return body
+
+
+def _gzip_compressor():
+    # Level 1: payloads are mostly log lines, and latency matters more than ratio
+    return zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    return body
+
+
+def _base_type(header: Optional[str]) -> str:
+    return (header or JSON).split(";")[0].strip().lower()
+
+
+def encode(
+    payload: Any, media_type: str = JSON, encoding: Optional[str] = None
+) -> Tuple[bytes, Dict[str, str]]:
+    # Body plus its Content-Type/Content-Encoding headers; small bodies stay uncompressed
+    body = dumps(payload, media_type)
+    headers = {"Content-Type": media_type}
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def decode(
+    body: bytes, content_type: Optional[str] = None, content_encoding: Optional[str] = None
+) -> Any:
+    media_type = _base_type(content_type)
+    if media_type not in (JSON, MSGPACK):
+        media_type = JSON
+    encoding = (content_encoding or "").strip().lower() or None
+    return loads(decompress(body, encoding), media_type)
+
+
+def _ranked(header: Optional[str]) -> List[str]:
+    # Accept-style header -> values by descending q, dropping q=0
+    ranked = []
+    for position, item in enumerate((header or "").split(",")):
+        parts = [p.strip() for p in item.split(";")]
+        if not parts[0]:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranked.append((-q, position, parts[0].lower()))
+    return [value for _, _, value in sorted(ranked)]
+
+
+def negotiate(accept: Optional[str], accept_encoding: Optional[str]) -> Tuple[str, Optional[str]]:
+    # Server side: the best response media type and content coding this process supports
+    ours = media_types()
+    media_type = next((t for t in _ranked(accept) if t in ours), JSON)
+    encoding = next((e for e in _ranked(accept_encoding) if e in encodings()), None)
+    return media_type, encoding
+
+
+def accept_headers() -> Dict[str, str]:
+    types = media_types()
+    accept = ", ".join(t if i == 0 else f"{t};q=0.{9 - i}" for i, t in enumerate(types))
+    return {"Accept": accept, "Accept-Encoding": ", ".join(encodings() or ["identity"])}
+
+
+def capability_headers() -> Dict[str, str]:
+    # Sent on every agent server response so clients can encode request bodies compactly
+    return {
+        "Accept-Post": ", ".join(media_types()),
+        "Accept-Encoding": ", ".join(encodings() or ["identity"]),
+    }
+
+
+class _Peer:
+    def __init__(self, media_type: str = JSON, encoding: Optional[str] = None):
+        self.media_type = media_type
+        self.encoding = encoding
+
+
+class PeerFormats:
+    # What each agent server (by base URL) accepts for request bodies, learned from its
+    # responses; unknown peers get plain JSON
+    def __init__(self):
+        self._peers: Dict[str, _Peer] = {}
+
+    def learn(self, base_url: str, headers: Any) -> None:
+        accept_post = headers.get("accept-post")
+        if accept_post is None:
+            return
+        theirs = _ranked(accept_post)
+        media_type = next((t for t in media_types() if t in theirs), JSON)
+        their_encodings = _ranked(headers.get("accept-encoding"))
+        encoding = next((e for e in encodings() if e in their_encodings), None)
+        self._peers[base_url] = _Peer(media_type, encoding)
+
+    def request_format(self, base_url: str) -> Tuple[str, Optional[str]]:
+        peer = self._peers.get(base_url)
+        return (peer.media_type, peer.encoding) if peer is not None else (JSON, None)
+
+    def forget(self, base_url: Optional[str] = None) -> None:
+        if base_url is None:
+            self._peers.clear()
+        else:
+            self._peers.pop(base_url, None)
+
+
+PEERS = PeerFormats()
+
+
+async def acompress_stream(
+    chunks: AsyncIterator[bytes], encoding: Optional[str]
+) -> AsyncIterator[bytes]:
+    if encoding is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        compressor = _gzip_compressor()
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+async def adecompress_stream(
+    chunks: AsyncIterator[bytes], encoding: Optional[str]
+) -> AsyncIterator[bytes]:
+    if encoding is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    if encoding == "zstd":
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    else:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        out = decompressor.decompress(chunk)
+        if out:
+            yield out
+    tail = getattr(decompressor, "flush", lambda: b"")()
+    if tail:
+        yield tail
@@ -1,145 +1,645 @@
-from typing import Callable, Dict, Generator, Optional
+import asyncio
+import json
+import os
+import time
 import httpx
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from app.core.a2a_models import Task, TaskResult, Event, TaskInput, AgentCard
-from app.agents import diagnoser, fixer, support
+from app.core import llm_scheduler, tracing, wire
+from app.core.aio import iterate_sync, run_sync
+from app.core.gemini import contains_fallback
+from app.core.logs import aiter_file_chunks
+from app.core.metrics import METRICS
+from app.core.singleflight import SingleFlight, coalesce_key
+from app.agents.loader import LazyAgents
 from app.orchestrator.registry import AgentRegistry
+from app.orchestrator.resilience import AgentEndpoints, RetryableError
+from app.server.limits import DEADLINE_HEADER
+from app.orchestrator.transport import CLIENT_POOL
+from app.orchestrator.store import get_task_store, input_fingerprint
+from app.orchestrator.workflow import RunOutcome, Workflow, workflow_for
 
-AgentRun = Callable[[TaskInput], TaskResult]
+AgentRun = Callable[..., TaskResult]
+
+UPLOAD_CONTENT_TYPE = "application/x-a2a-log-upload"
 AgentRegistryEntry = Dict[str, object]
 
 
-LOCAL_REGISTRY: Dict[str, AgentRegistryEntry] = {
-    "diagnoser": {"card": diagnoser.get_agent_card(), "run": diagnoser.run},
-    "fixer": {"card": fixer.get_agent_card(), "run": fixer.run},
-    "support": {"card": support.get_agent_card(), "run": support.run},
-}
+class LocalRegistry:
+    # In-process agents as {"card", "run", "run_async"?} entries, built when an agent is
+    # first run so importing the executor does not import every agent
+    def __init__(self, agents: LazyAgents):
+        self.agents = agents
+        self._entries: Dict[str, AgentRegistryEntry] = {}
+
+    def __contains__(self, agent_id: object) -> bool:
+        return agent_id in self._entries or agent_id in self.agents
+
+    def register(self, agent_id: str, entry: AgentRegistryEntry) -> None:
+        self._entries[agent_id] = entry
+
+    def get(self, agent_id: str) -> Optional[AgentRegistryEntry]:
+        entry = self._entries.get(agent_id)
+        if entry is None:
+            module = self.agents.get(agent_id)
+            if module is None:
+                return None
+            entry = {"card": module.get_agent_card(), "run": module.run}
+            if hasattr(module, "run_async"):
+                entry["run_async"] = module.run_async
+            self._entries[agent_id] = entry
+        return entry
+
+
+LOCAL_REGISTRY = LocalRegistry(LazyAgents())
 
 REMOTE_REGISTRY = AgentRegistry.from_env_or_file()
 
+FLIGHTS = SingleFlight("executor")
 
-def _fetch_remote_card(agent_id: str, base_url: str) -> Optional[AgentCard]:
+# Default end-to-end budget for a task without an explicit deadline (unset = no deadline)
+TASK_TIMEOUT_S = os.getenv("A2A_TASK_TIMEOUT_S")
+
+# Event payload size: "full" carries the task (with its logs), agent card and results;
+# "summary" keeps ids, statuses, summaries and timings only. Final results are the same.
+VERBOSITY_LEVELS = ("full", "summary")
+EVENT_VERBOSITY = os.getenv("A2A_EVENT_VERBOSITY", "full").lower()
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.time()
+
+
+def _deadline_result() -> TaskResult:
+    return TaskResult(status="error", summary="Deadline exceeded", details={})
+
+
+async def _fetch_remote_card_async(agent_id: str, base_url: str) -> Optional[AgentCard]:
+    # Served from the registry's card cache; only a cold miss goes to the network
+    return await REMOTE_REGISTRY.cards.get(agent_id, base_url)
+
+
+async def _upload_body(input_data: TaskInput) -> AsyncIterator[bytes]:
+    # Upload framing: one JSON header line with the context, then the raw log bytes
+    header = {"context": input_data.context, "idempotency_key": input_data.idempotency_key}
+    yield (json.dumps(header) + "\n").encode("utf-8")
+    async for chunk in aiter_file_chunks(input_data.log_ref):  # type: ignore[arg-type]
+        yield chunk
+
+
+def _run_request(
+    agent_id: str,
+    input_data: TaskInput,
+    stream: bool = False,
+    deadline: Optional[float] = None,
+    base_url: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    # File-backed logs are streamed with chunked transfer instead of being inlined as JSON.
+    # Bodies use the most compact encoding the agent server has advertised (JSON until known).
+    headers: Dict[str, str] = dict(wire.accept_headers())
+    request: Dict[str, Any] = {"headers": headers}
+    media_type, encoding = wire.PEERS.request_format(base_url) if base_url else (wire.JSON, None)
+    remaining = _remaining(deadline)
+    if remaining is not None:
+        # The agent server gets the remaining budget and gives up (504) once it is spent
+        headers[DEADLINE_HEADER] = str(max(0, int(remaining * 1000)))
+        request["timeout"] = max(remaining, 0.001)
+    _, priority = llm_scheduler.current_caller()
+    if priority != llm_scheduler.INTERACTIVE:
+        # The agent server schedules its LLM calls in the same class
+        headers[llm_scheduler.PRIORITY_HEADER] = priority
+    if input_data.log_ref is not None:
+        url = f"/agent/{agent_id}/run/upload" + ("?stream=true" if stream else "")
+        headers["Content-Type"] = UPLOAD_CONTENT_TYPE
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        request["content"] = wire.acompress_stream(_upload_body(input_data), encoding)
+        return url, request
+    url = f"/agent/{agent_id}/run" + ("/stream" if stream else "")
+    body = {"logs": input_data.logs, "context": input_data.context, "idempotency_key": input_data.idempotency_key}
+    if media_type == wire.JSON and encoding is None:
+        request["json"] = body
+    else:
+        request["content"], body_headers = wire.encode(body, media_type, encoding)
+        headers.update(body_headers)
+    return url, request
+
+
+def _decode_result(resp: httpx.Response) -> TaskResult:
+    # httpx has already undone Content-Encoding; the body is JSON or msgpack
+    return TaskResult.model_validate(wire.decode(resp.content, resp.headers.get("content-type")))
+
+
+def _endpoints(agent_id: str, base_url: str) -> AgentEndpoints:
+    # All configured endpoints for the agent; a bare URL still gets breaker/retry handling
+    configured = REMOTE_REGISTRY.endpoints_for(agent_id)
+    return configured or REMOTE_REGISTRY.endpoints.get(agent_id, [base_url])
+
+
+def _attempt_request(
+    agent_id: str, base_url: str, input_data: TaskInput, stream: bool, deadline: Optional[float]
+):
+    url, request = _run_request(agent_id, input_data, stream, deadline, base_url)
+    attempt_timeout = REMOTE_REGISTRY.endpoints.policy.attempt_timeout
+    if attempt_timeout:
+        request["timeout"] = min(request.get("timeout", attempt_timeout), attempt_timeout)
+    return url, request
+
+
+def _raise_if_retryable(agent_id: str, base_url: str, resp: httpx.Response) -> None:
+    # 429: agent overloaded, try elsewhere without marking it unhealthy. Any other 5xx is an
+    # endpoint fault (crashing agent, bad gateway, unavailable), except 501 (a permanent
+    # answer) and 504, which the agent server returns as a TaskResult once the deadline is spent.
+    if resp.status_code == 429:
+        METRICS.incr("remote_rejected", agent=agent_id, status="429")
+        try:
+            retry_after: Optional[float] = float(resp.headers.get("retry-after", ""))
+        except ValueError:
+            retry_after = None
+        message = f"Remote {agent_id} overloaded"
+        raise RetryableError(message, failure=False, retry_after=retry_after)
+    if resp.status_code >= 500 and resp.status_code not in (501, 504):
+        raise RetryableError(f"Remote {agent_id} at {base_url} HTTP {resp.status_code}")
+
+
+def _remote_failure(exc: Exception) -> TaskResult:
+    details: Dict[str, Any] = {"error": str(exc)}
+    if isinstance(exc, RetryableError) and exc.retry_after is not None:
+        details["retry_after"] = exc.retry_after
+    return TaskResult(status="error", summary="Remote agent error", details=details)
+
+
+async def _post_run(
+    agent_id: str, base_url: str, input_data: TaskInput, deadline: Optional[float]
+) -> TaskResult:
+    # One attempt against one endpoint
+    client = CLIENT_POOL.get(base_url)
+    with tracing.span("a2a.run_remote", agent=agent_id, url=base_url) as span:
+        url, request = _attempt_request(agent_id, base_url, input_data, False, deadline)
+        tracing.inject(request["headers"])
+        started = time.perf_counter()
+        try:
+            resp = await client.post(url, **request)
+        except httpx.TransportError as e:
+            raise RetryableError(f"{base_url}: {e!r}") from e
+        finally:
+            METRICS.observe("remote_call_seconds", time.perf_counter() - started, agent=agent_id)
+        span.set_attribute("http.status_code", resp.status_code)
+        span.set_attribute("bytes_received", len(resp.content))
+        wire.PEERS.learn(base_url, resp.headers)
+        _raise_if_retryable(agent_id, base_url, resp)
+        if resp.status_code not in (200, 504):
+            summary = f"Remote {agent_id} HTTP {resp.status_code}"
+            return TaskResult(status="error", summary=summary, details={})
+        if resp.status_code == 504:
+            # The agent gave up once the deadline was spent
+            METRICS.incr("remote_rejected", agent=agent_id, status="504")
+        decode_started = time.perf_counter()
+        result = _decode_result(resp)
+        span.set_attribute("decode_ms", round((time.perf_counter() - decode_started) * 1000, 3))
+        return result
+
+
+async def _open_stream(
+    agent_id: str, base_url: str, input_data: TaskInput, deadline: Optional[float]
+) -> httpx.Response:
+    # Retries only cover getting a response; once output flows the stream is not replayed
+    client = CLIENT_POOL.get(base_url)
+    with tracing.span("a2a.run_remote", agent=agent_id, url=base_url, stream=True) as span:
+        url, request = _attempt_request(agent_id, base_url, input_data, True, deadline)
+        tracing.inject(request["headers"])
+        try:
+            resp = await client.send(client.build_request("POST", url, **request), stream=True)
+        except httpx.TransportError as e:
+            raise RetryableError(f"{base_url}: {e!r}") from e
+        span.set_attribute("http.status_code", resp.status_code)
+    wire.PEERS.learn(base_url, resp.headers)
     try:
-        with httpx.Client(timeout=10) as client:
-            resp = client.get(f"{base_url}/agent/{agent_id}/card")
-            if resp.status_code == 200:
-                data = resp.json()
-                return AgentCard.model_validate(data)
-    except Exception:
-        return None
-    return None
+        _raise_if_retryable(agent_id, base_url, resp)
+    except RetryableError:
+        await resp.aclose()
+        raise
+    return resp
 
 
-def _run_remote(agent_id: str, base_url: str, input_data: TaskInput) -> TaskResult:
+async def _run_remote_async(
+    agent_id: str, base_url: str, input_data: TaskInput, deadline: Optional[float] = None
+) -> TaskResult:
+    # Balanced across the agent's endpoints; calls with an idempotency key are retried
+    # with jittered backoff and, when A2A_HEDGE is on, hedged after the p95 latency
+    remaining = _remaining(deadline)
+    if remaining is not None and remaining <= 0:
+        return _deadline_result()
     try:
-        with httpx.Client(timeout=60) as client:
-            resp = client.post(
-                f"{base_url}/agent/{agent_id}/run",
-                json={"logs": input_data.logs, "context": input_data.context},
-            )
-            if resp.status_code == 200:
-                return TaskResult.model_validate(resp.json())
-            return TaskResult(status="error", summary=f"Remote {agent_id} HTTP {resp.status_code}", details={})
+        return await _endpoints(agent_id, base_url).call(
+            lambda url: _post_run(agent_id, url, input_data, deadline),
+            idempotent=input_data.idempotency_key is not None,
+            deadline=deadline,
+        )
     except Exception as e:  # noqa: BLE001
-        return TaskResult(status="error", summary="Remote agent error", details={"error": str(e)})
+        return _remote_failure(e)
+
+
+async def _run_remote_stream(
+    agent_id: str, base_url: str, input_data: TaskInput, deadline: Optional[float] = None
+) -> AsyncGenerator[Union[str, TaskResult], None]:
+    # Yields text deltas, then exactly one TaskResult
+    remaining = _remaining(deadline)
+    if remaining is not None and remaining <= 0:
+        yield _deadline_result()
+        return
+    try:
+        resp = await _endpoints(agent_id, base_url).call(
+            lambda url: _open_stream(agent_id, url, input_data, deadline),
+            idempotent=input_data.idempotency_key is not None,
+            deadline=deadline,
+            hedge=False,
+        )
+    except Exception as e:  # noqa: BLE001
+        yield _remote_failure(e)
+        return
+    try:
+        if resp.status_code == 404:
+            # Older agent server without streaming support
+            yield await _run_remote_async(agent_id, base_url, input_data, deadline)
+            return
+        if resp.status_code == 504:
+            METRICS.incr("remote_rejected", agent=agent_id, status="504")
+            await resp.aread()
+            yield _decode_result(resp)
+            return
+        if resp.status_code != 200:
+            yield TaskResult(status="error", summary=f"Remote {agent_id} HTTP {resp.status_code}", details={})
+            return
+        async for line in resp.aiter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message.get("type") == "delta":
+                yield message.get("text", "")
+            elif message.get("type") == "result":
+                yield TaskResult.model_validate(message["result"])
+                return
+        yield TaskResult(status="error", summary=f"Remote {agent_id} stream ended without result", details={})
+    except Exception as e:  # noqa: BLE001
+        yield TaskResult(status="error", summary="Remote agent error", details={"error": str(e)})
+    finally:
+        await resp.aclose()
+
+
+async def _run_local_stream(run: AgentRun, input_data: TaskInput) -> AsyncGenerator[Union[str, TaskResult], None]:
+    # The agent runs in a worker thread; deltas hop onto the loop in order, None marks the end
+    loop = asyncio.get_running_loop()
+    deltas: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    def on_delta(text: str) -> None:
+        loop.call_soon_threadsafe(deltas.put_nowait, text)
+
+    job = asyncio.ensure_future(asyncio.to_thread(run, input_data, on_delta=on_delta))
+    job.add_done_callback(lambda _: deltas.put_nowait(None))
+    while True:
+        piece = await deltas.get()
+        if piece is None:
+            break
+        yield piece
+    yield job.result()
 
 
-def execute(task: Task) -> Generator[Event, None, TaskResult]:
-    yield Event(type="task.created", message=f"Task {task.id} created", data=task.model_dump())
+def _fetch_remote_card(agent_id: str, base_url: str) -> Optional[AgentCard]:
+    return run_sync(_fetch_remote_card_async(agent_id, base_url))
+
+
+def _run_remote(agent_id: str, base_url: str, input_data: TaskInput) -> TaskResult:
+    return run_sync(_run_remote_async(agent_id, base_url, input_data))
+
+
+async def _run_once(
+    task: Task, remote_url: Optional[str], run: Optional[AgentRun], run_async: Any
+) -> TaskResult:
+    if remote_url:
+        return await _run_remote_async(task.agent_id, remote_url, task.input, task.deadline)
+    with tracing.span("agent.run", agent=task.agent_id):
+        # Local agents either await the LLM natively or block; keep blocking ones off the loop
+        if run_async is not None:
+            return await run_async(task.input)
+        return await asyncio.to_thread(run, task.input)  # type: ignore[arg-type]
+
+
+async def _traced(
+    source: AsyncIterator[Any], span: tracing.Span, task: Task
+) -> AsyncGenerator[Any, None]:
+    # Runs each step of `source` with `span` current and LLM calls tagged with the task's
+    # agent and priority, without holding either across our own yields
+    try:
+        while True:
+            with span.activate(), llm_scheduler.caller(task.agent_id, task.priority):
+                try:
+                    item = await source.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        await source.aclose()  # type: ignore[attr-defined]
+
+
+async def _run_agent_async(
+    task: Task, outcome: RunOutcome, stream: bool = False, emit_completed: bool = True
+) -> AsyncGenerator[Event, None]:
+    # One agent hop, traced as one span; timings land in event data and the metrics
+    span = tracing.start_span(
+        "a2a.agent", parent=task.trace_parent, agent=task.agent_id, task_id=task.id
+    )
+    started = time.perf_counter()
+    events = _agent_events(task, outcome, stream, emit_completed, span)
+    try:
+        async for event in _traced(events, span, task):
+            yield event
+    finally:
+        result = outcome.result
+        if outcome.aborted or (result is not None and result.status == "error"):
+            METRICS.incr("agent_errors", agent=task.agent_id, layer="executor")
+            span.set_attribute("error", True)
+        elapsed = time.perf_counter() - started
+        METRICS.observe("agent_run_seconds", elapsed, agent=task.agent_id, layer="executor")
+        span.end()
+
+
+async def _agent_events(
+    task: Task, outcome: RunOutcome, stream: bool, emit_completed: bool, span: tracing.Span
+) -> AsyncGenerator[Event, None]:
+    # Lifecycle events around a single local or remote run
+    task_started = time.perf_counter()
+    yield Event.lazy("task.created", f"Task {task.id} created", task.model_dump, task.brief)
     yield Event(type="task.started", message=f"Task {task.id} started", data={"agent": task.agent_id})
 
     # Resolve remote URL if configured; otherwise use local registry
     remote_url = REMOTE_REGISTRY.get_url(task.agent_id)
+    started_data: Dict[str, Any] = {}
     if remote_url:
-        card = _fetch_remote_card(task.agent_id, remote_url) or AgentCard(
-            id=task.agent_id,
-            name=task.agent_id.capitalize(),
-            description=f"Remote agent at {remote_url}",
-            capabilities=[],
-        )
+        span.set_attribute("remote_url", remote_url)
+        card_started = time.perf_counter()
+        with tracing.span("a2a.fetch_card", agent=task.agent_id, url=remote_url):
+            card = await _fetch_remote_card_async(task.agent_id, remote_url) or AgentCard(
+                id=task.agent_id,
+                name=task.agent_id.capitalize(),
+                description=f"Remote agent at {remote_url}",
+                capabilities=[],
+            )
+        started_data["card_ms"] = round((time.perf_counter() - card_started) * 1000, 3)
         run = None  # indicates remote
+        run_async = None
     else:
         entry = LOCAL_REGISTRY.get(task.agent_id)
         if not entry:
             yield Event(type="error", message=f"Unknown agent: {task.agent_id}")
-            return TaskResult(status="error", summary="Unknown agent", details={})
+            outcome.result = TaskResult(status="error", summary="Unknown agent", details={})
+            outcome.aborted = True
+            return
         card = entry["card"]
         run: AgentRun = entry["run"]  # type: ignore
+        run_async = entry.get("run_async")
 
-    yield Event(
-        type="agent.started",
-        message=f"{card.name} started",
-        data={"agent": card.model_dump(), "agent_id": card.id},
+    yield Event.lazy(
+        "agent.started",
+        f"{card.name} started",
+        lambda: {"agent": card.model_dump()},
+        agent_id=card.id,
+        **started_data,
     )
 
+    started_at = time.perf_counter()
+    first_delta_at: Optional[float] = None
+    coalesced = False
     try:
-        if remote_url:
-            result = _run_remote(task.agent_id, remote_url, task.input)
-            if result.status == "error":
+        if stream:
+            if remote_url:
+                source = _run_remote_stream(task.agent_id, remote_url, task.input, task.deadline)
+            else:
+                source = _run_local_stream(run, task.input)  # type: ignore[arg-type]
+            async for item in source:
+                if isinstance(item, TaskResult):
+                    result = item
+                    continue
+                if first_delta_at is None:
+                    first_delta_at = time.perf_counter()
+                yield Event(
+                    type="agent.delta",
+                    message=f"{card.name} output",
+                    data={"agent_id": card.id, "text": item},
+                )
+            if remote_url and result.status == "error":
                 yield Event(type="error", message=result.summary, data=result.details)
         else:
-            result = run(task.input)  # type: ignore[misc]
+            # Identical in-flight runs (same agent, same normalized input) share one call
+            key = coalesce_key(task.agent_id, task.input)
+            job = FLIGHTS.do(
+                key, lambda: _run_once(task, remote_url, run, run_async), agent=task.agent_id
+            )
+            result, coalesced = await asyncio.wait_for(job, _remaining(task.deadline))
+            if coalesced:
+                result = result.model_copy(deep=True)
+            if remote_url and result.status == "error":
+                yield Event(type="error", message=result.summary, data=result.details)
+    except asyncio.TimeoutError:
+        yield Event(type="error", message="Deadline exceeded")
+        outcome.result = _deadline_result()
+        outcome.aborted = True
+        return
     except Exception as e:  # noqa: BLE001
         yield Event(type="error", message=str(e))
-        return TaskResult(status="error", summary="Agent error", details={"error": str(e)})
+        outcome.result = TaskResult(status="error", summary="Agent error", details={"error": str(e)})
+        outcome.aborted = True
+        return
 
-    yield Event(
-        type="agent.completed",
-        message=f"{card.name} completed",
-        data={"result": result.model_dump(), "agent_id": card.id},
+    completed_data: Dict[str, Any] = {
+        "agent_id": card.id,
+        "duration_ms": round((time.perf_counter() - started_at) * 1000, 1),
+    }
+    if coalesced:
+        completed_data["coalesced"] = True
+    if first_delta_at is not None:
+        completed_data["ttft_ms"] = round((first_delta_at - started_at) * 1000, 1)
+    yield Event.lazy(
+        "agent.completed",
+        f"{card.name} completed",
+        lambda: {"result": result.model_dump()},
+        lambda: {"result": result.brief()},
+        **completed_data,
     )
 
-    # Simple delegation policy: Diagnoser -> Fixer -> Support (conditional)
-    if task.agent_id == "diagnoser":
-        # Pass the original logs plus diagnosis into Fixer
-        # Merge context forward
-        next_context = task.input.context or {}
-        if result.details.get("context"):
-            next_context.update(result.details.get("context"))
-        # Provide both original logs and diagnosis summary to Fixer
-        diagnosis_summary = result.details.get("summary") or result.details.get("raw", "")
-        fixer_input = TaskInput(
-            logs=f"Diagnosis + Logs\n\n{diagnosis_summary}\n\n{task.input.logs}",
-            context=next_context,
-        )
-        yield Event(
-            type="delegation.requested",
-            message="Delegating to Fixer",
-            data={"to": "fixer"},
-        )
-        sub_task = Task(id=f"{task.id}:fix", agent_id="fixer", input=fixer_input)
-        sub_result = yield from execute(sub_task)
+    outcome.result = result
+    if emit_completed:
+        duration_ms = round((time.perf_counter() - task_started) * 1000, 1)
         yield Event(
-            type="delegation.completed",
-            message="Fixer finished",
-            data=sub_result.model_dump(),
+            type="task.completed", message="Task completed", data={"duration_ms": duration_ms}
         )
-        if sub_result.status == "needs_support":
-            # Merge context
-            support_context = fixer_input.context or {}
-            if sub_result.details.get("context"):
-                support_context.update(sub_result.details.get("context"))
-            support_input = TaskInput(
-                logs=f"Need support. Context:\n\n{sub_result.details.get('plan', '')}\n\n{task.input.logs}",
-                context=support_context,
-            )
-            yield Event(
-                type="delegation.requested",
-                message="Delegating to Support",
-                data={"to": "support"},
-            )
-            support_task = Task(id=f"{task.id}:support", agent_id="support", input=support_input)
-            support_result = yield from execute(support_task)
-            yield Event(
-                type="delegation.completed",
-                message="Support finished",
-                data=support_result.model_dump(),
-            )
-            yield Event(type="task.completed", message="Task fully completed")
-            return support_result
-        else:
-            yield Event(type="task.completed", message="Task completed with Fixer result")
-            return sub_result
 
-    # If not diagnoser entry point, we just return the agent result
-    yield Event(type="task.completed", message="Task completed")
-    return result
+
+async def _run_step_async(
+    task: Task, outcome: RunOutcome, stream: bool = False, emit_completed: bool = True
+) -> AsyncGenerator[Event, None]:
+    # Checkpointing wrapper: a step that already completed for the same input is replayed
+    # from the task store (events and result) instead of calling the agent again
+    store = get_task_store()
+    if store is None:
+        async for event in _run_agent_async(task, outcome, stream, emit_completed):
+            yield event
+        return
+    fingerprint = input_fingerprint(task)
+    # Store I/O runs in a worker thread, never on the event loop
+    stored = await asyncio.to_thread(store.load_completed, task.id, fingerprint)
+    if stored is not None:
+        METRICS.incr("task_steps_replayed", agent=task.agent_id)
+        result, events = stored
+        for event in events:
+            yield event
+        outcome.result = result
+        return
+    # Events are kept in their brief form, so checkpointing never builds a deferred payload
+    # (the stored task holds the input, the result is stored in full), and are written with
+    # the result once the step is done. Streamed deltas are not replayed.
+    checkpoint: List[Event] = []
+    async for event in _run_agent_async(task, outcome, stream, emit_completed):
+        if event.type != "agent.delta":
+            checkpoint.append(event.summary())
+        yield event
+    result = outcome.result
+    if result is None or outcome.aborted or result.status == "error":
+        return
+    # Like the response cache, never checkpoint an answer built on the mocked LLM fallback:
+    # a rerun once the API is back must produce the real one
+    if contains_fallback(result.summary) or contains_fallback(result.details):
+        METRICS.incr("task_steps_not_checkpointed", agent=task.agent_id, reason="llm_fallback")
+        return
+    await asyncio.to_thread(store.complete, task.id, fingerprint, result, checkpoint)
+
+
+async def execute_async(
+    task: Task,
+    outcome: Optional[RunOutcome] = None,
+    stream: bool = False,
+    workflow: Optional[Workflow] = None,
+    verbosity: Optional[str] = None,
+) -> AsyncGenerator[Event, None]:
+    # Delegation is declared as a workflow DAG; the default for "diagnoser" is
+    # Diagnoser -> Fixer -> Support (when Fixer returns needs_support)
+    verbosity = (verbosity or EVENT_VERBOSITY).lower()
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown event verbosity: {verbosity}")
+    outcome = outcome if outcome is not None else RunOutcome()
+    workflow = workflow or workflow_for(task.agent_id)
+    if task.input.idempotency_key is None:
+        # Same task id and input => same side effects (e.g. the same support ticket) on retries
+        key = f"{task.id}@{input_fingerprint(task)[:12]}"
+        task = task.model_copy(update={"input": task.input.model_copy(update={"idempotency_key": key})})
+    if task.deadline is None and TASK_TIMEOUT_S:
+        task = task.model_copy(update={"deadline": time.time() + float(TASK_TIMEOUT_S)})
+    span = tracing.start_span(
+        "a2a.execute", parent=task.trace_parent, agent=task.agent_id, task_id=task.id
+    )
+    task = task.model_copy(update={"trace_parent": span.traceparent() or task.trace_parent})
+    store = get_task_store()
+    if store is not None:
+        await asyncio.to_thread(store.save_task, task)
+    try:
+        async for event in workflow.run(task, _run_step_async, outcome, stream=stream):
+            yield event if verbosity == "full" else event.summary()
+    finally:
+        if outcome.result is not None:
+            span.set_attribute("status", outcome.result.status)
+        span.end()
+
+
+async def resume_async(
+    task_id: str,
+    outcome: Optional[RunOutcome] = None,
+    stream: bool = False,
+    verbosity: Optional[str] = None,
+) -> AsyncGenerator[Event, None]:
+    # Re-run a stored task: completed steps replay from the store, the rest execute
+    store = get_task_store()
+    task = await asyncio.to_thread(store.load_task, task_id) if store is not None else None
+    if task is None:
+        yield Event(type="error", message=f"Unknown task: {task_id}")
+        if outcome is not None:
+            outcome.result = TaskResult(status="error", summary="Unknown task", details={})
+        return
+    # A resumed run is a new trace with a fresh deadline: the stored one is the absolute time
+    # the original run had to finish by, usually long past
+    task = task.model_copy(update={"trace_parent": None, "deadline": None})
+    async for event in execute_async(task, outcome, stream=stream, verbosity=verbosity):
+        yield event
+
+
+def execute(
+    task: Task,
+    stream: bool = False,
+    workflow: Optional[Workflow] = None,
+    verbosity: Optional[str] = None,
+) -> Generator[Event, None, TaskResult]:
+    # Sync facade for the Streamlit UI; runs the async executor on a shared background loop
+    outcome = RunOutcome()
+    events = execute_async(task, outcome, stream=stream, workflow=workflow, verbosity=verbosity)
+    yield from iterate_sync(events)
+    return outcome.result  # type: ignore[return-value]
+
+
+def resume(
+    task_id: str, stream: bool = False, verbosity: Optional[str] = None
+) -> Generator[Event, None, TaskResult]:
+    outcome = RunOutcome()
+    yield from iterate_sync(resume_async(task_id, outcome, stream=stream, verbosity=verbosity))
+    return outcome.result  # type: ignore[return-value]
+
+
+async def execute_many_async(
+    tasks: Iterable[Task], concurrency: int = 8
+) -> AsyncGenerator[Tuple[Task, TaskResult], None]:
+    # Runs each task through the full delegation policy, at most `concurrency` at a time,
+    # yielding (task, result) in completion order. Tasks are pulled lazily from the iterable.
+    loop = asyncio.get_running_loop()
+    finished: "asyncio.Queue[Tuple[Task, TaskResult]]" = asyncio.Queue()
+    pending = iter(tasks)
+    workers: Set["asyncio.Task[None]"] = set()
+
+    async def worker(task: Task) -> None:
+        outcome = RunOutcome()
+        run_task = task
+        if task.priority is None:
+            # Bulk work yields the LLM quota to interactive runs
+            run_task = task.model_copy(update={"priority": llm_scheduler.BULK})
+        try:
+            # Events are discarded, so none of their payloads are ever built
+            async for _ in execute_async(run_task, outcome, verbosity="summary"):
+                pass
+            result = outcome.result or TaskResult(status="error", summary="No result", details={})
+        except Exception as e:  # noqa: BLE001
+            result = TaskResult(status="error", summary="Agent error", details={"error": str(e)})
+        await finished.put((task, result))
+
+    def launch() -> bool:
+        task = next(pending, None)
+        if task is None:
+            return False
+        job = loop.create_task(worker(task))
+        workers.add(job)
+        job.add_done_callback(workers.discard)
+        return True
+
+    running = 0
+    while running < max(1, concurrency) and launch():
+        running += 1
+    try:
+        while running:
+            item = await finished.get()
+            running -= 1
+            if launch():
+                running += 1
+            yield item
+    finally:
+        for job in workers:
+            job.cancel()
+
+
+def execute_many(tasks: Iterable[Task], concurrency: int = 8) -> Iterator[Tuple[Task, TaskResult]]:
+    return iterate_sync(execute_many_async(tasks, concurrency=concurrency))
@@ -1,27 +1,237 @@
+import asyncio
 import json
 import os
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from app.core.a2a_models import AgentCard
+from app.core.metrics import METRICS
+from app.core.wire import PEERS
+from app.orchestrator.resilience import AgentEndpoints, EndpointPool
+from app.orchestrator.transport import CLIENT_POOL
 
 _DEFAULT_REGISTRY = {
     # Fallback: no remote; use local functions
 }
+_UNLOADED = object()
+
+_DEFAULT_CARD_TTL = 300.0
+# How often the registry file is checked for changes, in seconds (A2A_AGENT_REGISTRY_POLL)
+_DEFAULT_POLL = 2.0
+_CARD_STATS = ("hits", "stale_hits", "misses", "refreshes", "not_modified", "refresh_errors")
+
+
+class _CardEntry:
+    def __init__(self, card: AgentCard, etag: Optional[str], fetched_at: float):
+        self.card = card
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+class CardCache:
+    # TTL + ETag revalidation + stale-while-revalidate: only a cold miss waits on the
+    # network; expired cards are served immediately while a background refresh runs.
+    def __init__(self, ttl: float = _DEFAULT_CARD_TTL, fetch_timeout: float = 10.0):
+        self.ttl = ttl
+        self.fetch_timeout = fetch_timeout
+        self._entries: Dict[Tuple[str, str], _CardEntry] = {}
+        self._inflight: Dict[Tuple[str, str], "asyncio.Task[Optional[AgentCard]]"] = {}
+
+    async def get(self, agent_id: str, base_url: str) -> Optional[AgentCard]:
+        key = (agent_id, base_url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if time.monotonic() - entry.fetched_at < self.ttl:
+                METRICS.incr("card_cache_hits", agent=agent_id)
+            else:
+                METRICS.incr("card_cache_stale_hits", agent=agent_id)
+                self._schedule_refresh(key)
+            return entry.card
+        METRICS.incr("card_cache_misses", agent=agent_id)
+        return await self._schedule_refresh(key)
+
+    async def warm(self, targets: Iterable[Tuple[str, str]]) -> None:
+        await asyncio.gather(*(self._schedule_refresh(key) for key in targets))
+
+    def invalidate(self, agent_id: Optional[str] = None) -> None:
+        for key in list(self._entries):
+            if agent_id is None or key[0] == agent_id:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        stats = {name: 0.0 for name in _CARD_STATS}
+        for name, value in METRICS.snapshot().items():
+            base = name.split("{")[0]
+            if base.startswith("card_cache_") and base[len("card_cache_"):] in stats:
+                stats[base[len("card_cache_"):]] += value
+        return stats
+
+    def _schedule_refresh(self, key: Tuple[str, str]) -> "asyncio.Task[Optional[AgentCard]]":
+        # One refresh per card at a time; concurrent misses share it
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._refresh(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        return task
+
+    def _forget(self, key: Tuple[str, str], task: "asyncio.Task[Optional[AgentCard]]") -> None:
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+
+    async def _refresh(self, key: Tuple[str, str]) -> Optional[AgentCard]:
+        agent_id, base_url = key
+        entry = self._entries.get(key)
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+        METRICS.incr("card_cache_refreshes", agent=agent_id)
+        try:
+            client = CLIENT_POOL.get(base_url)
+            resp = await client.get(f"/agent/{agent_id}/card", headers=headers, timeout=self.fetch_timeout)
+            PEERS.learn(base_url, resp.headers)
+            if resp.status_code == 304 and entry is not None:
+                METRICS.incr("card_cache_not_modified", agent=agent_id)
+                entry.fetched_at = time.monotonic()
+                return entry.card
+            if resp.status_code == 200:
+                card = AgentCard.model_validate(resp.json())
+                self._entries[key] = _CardEntry(card, resp.headers.get("etag"), time.monotonic())
+                return card
+        except Exception:
+            pass
+        METRICS.incr("card_cache_refresh_errors", agent=agent_id)
+        # Keep serving the stale card if we have one
+        return entry.card if entry is not None else None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_mapping(path: str) -> Dict[str, Union[str, List[str]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {k: [str(u) for u in v] if isinstance(v, list) else str(v) for k, v in data.items()}
 
 
 class AgentRegistry:
-    def __init__(self, mapping: Dict[str, str]):
-        self.mapping = mapping
+    # Each agent maps to one base URL or a list of them; calls are balanced across the list.
+    # With a `path`, the mapping is read from that JSON file on first use and re-read whenever
+    # the file changes (checked at most every `poll` seconds), so agents can be added, moved
+    # or removed without restarting the orchestrator.
+    def __init__(
+        self,
+        mapping: Optional[Dict[str, Union[str, List[str]]]] = None,
+        card_ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        poll: Optional[float] = None,
+    ):
+        self.path = path
+        self.poll = _env_float("A2A_AGENT_REGISTRY_POLL", _DEFAULT_POLL) if poll is None else poll
+        self._mapping: Dict[str, Union[str, List[str]]] = dict(mapping or {})
+        # (mtime_ns, size) of the file behind the current mapping; _UNLOADED until first read
+        self._stamp: object = _UNLOADED if path is not None and mapping is None else None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.endpoints = EndpointPool()
+        if card_ttl is None:
+            card_ttl = _env_float("A2A_CARD_TTL", _DEFAULT_CARD_TTL)
+        self.cards = CardCache(ttl=card_ttl)
 
     @classmethod
     def from_env_or_file(cls) -> "AgentRegistry":
+        # Nothing is read here; the file is loaded on first lookup and watched after that
         path = os.getenv("A2A_AGENT_REGISTRY") or os.path.join(os.getcwd(), "agents.local.json")
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    return cls(mapping={k: str(v) for k, v in data.items()})
-            except Exception:
-                pass
-        return cls(mapping=_DEFAULT_REGISTRY)
+        return cls(path=path)
+
+    @property
+    def mapping(self) -> Dict[str, Union[str, List[str]]]:
+        self.reload_if_changed()
+        return self._mapping
+
+    @mapping.setter
+    def mapping(self, value: Dict[str, Union[str, List[str]]]) -> None:
+        # An explicit mapping stays in place until the file changes again
+        with self._lock:
+            self._mapping = dict(value)
+            self._stamp = _file_stamp(self.path) if self.path is not None else None
+            self._checked = time.monotonic()
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        if self.path is None:
+            return False
+        now = time.monotonic()
+        if not force and self._stamp is not _UNLOADED and now - self._checked < self.poll:
+            return False
+        with self._lock:
+            self._checked = now
+            stamp = _file_stamp(self.path)
+            if stamp == self._stamp:
+                return False
+            if stamp is None:
+                mapping: Dict[str, Union[str, List[str]]] = dict(_DEFAULT_REGISTRY)
+            else:
+                try:
+                    mapping = _read_mapping(self.path)
+                except Exception:
+                    # Half-written or invalid: keep the current mapping and try again next poll
+                    METRICS.incr("registry_reload_errors")
+                    if self._stamp is _UNLOADED:
+                        self._stamp = None
+                    return False
+            reloaded = self._stamp is not _UNLOADED
+            changed = [
+                agent_id
+                for agent_id in set(self._mapping) | set(mapping)
+                if self._mapping.get(agent_id) != mapping.get(agent_id)
+            ]
+            self._mapping = mapping
+            self._stamp = stamp
+        for agent_id in changed:
+            self.cards.invalidate(agent_id)
+        if reloaded:
+            METRICS.incr("registry_reloads")
+        return True
+
+    def get_urls(self, agent_id: str) -> List[str]:
+        value = self.mapping.get(agent_id)
+        if not value:
+            return []
+        return [value] if isinstance(value, str) else list(value)
+
+    def endpoints_for(self, agent_id: str) -> Optional[AgentEndpoints]:
+        urls = self.get_urls(agent_id)
+        return self.endpoints.get(agent_id, urls) if urls else None
 
     def get_url(self, agent_id: str) -> Optional[str]:
-        return self.mapping.get(agent_id)
+        # The least-loaded healthy endpoint (or the first one when all circuits are open)
+        endpoints = self.endpoints_for(agent_id)
+        return endpoints.preferred_url() if endpoints is not None else None
+
+    async def get_card(self, agent_id: str) -> Optional[AgentCard]:
+        url = self.get_url(agent_id)
+        if not url:
+            return None
+        return await self.cards.get(agent_id, url)
+
+    async def warm_cards(self) -> None:
+        targets = [(agent_id, url) for agent_id in self.mapping for url in self.get_urls(agent_id)]
+        await self.cards.warm(targets)
+
+    def card_stats(self) -> Dict[str, float]:
+        return self.cards.stats()
+
+    def health(self) -> Dict[str, List[Dict[str, object]]]:
+        return self.endpoints.health()
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence, TypeVar
+
+from app.core.metrics import METRICS
+
+T = TypeVar("T")
+
+
+class RetryableError(Exception):
+    # `failure` marks the endpoint unhealthy (connect errors, 5xx); an overloaded endpoint
+    # (429) is retried elsewhere without tripping its breaker.
+    def __init__(self, message: str, failure: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.failure = failure
+        self.retry_after = retry_after
+
+
+class NoHealthyEndpoint(RuntimeError):
+    pass
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ResiliencePolicy:
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        attempt_timeout: Optional[float] = None,
+    ):
+        self.attempts = max(1, attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.attempt_timeout = attempt_timeout
+
+    @classmethod
+    def from_env(cls) -> "ResiliencePolicy":
+        return cls(
+            attempts=int(_env_float("A2A_RETRY_ATTEMPTS", 3)),
+            backoff_base=_env_float("A2A_RETRY_BACKOFF", 0.1),
+            backoff_max=_env_float("A2A_RETRY_BACKOFF_MAX", 2.0),
+            failure_threshold=int(_env_float("A2A_BREAKER_FAILURES", 5)),
+            reset_timeout=_env_float("A2A_BREAKER_RESET", 30.0),
+            hedge=os.getenv("A2A_HEDGE", "0").lower() in ("1", "true", "yes"),
+            hedge_min_samples=int(_env_float("A2A_HEDGE_MIN_SAMPLES", 20)),
+            attempt_timeout=_env_float("A2A_RETRY_ATTEMPT_TIMEOUT", 0) or None,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class Endpoint:
+    # Outstanding-request count plus a consecutive-failure circuit breaker:
+    # closed -> open after `failure_threshold` failures -> half-open (one probe) after
+    # `reset_timeout` -> closed on success, open again on failure.
+    def __init__(self, agent_id: str, url: str, policy: ResiliencePolicy):
+        self.agent_id = agent_id
+        self.url = url
+        self.policy = policy
+        self.outstanding = 0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def state(self, now: Optional[float] = None) -> str:
+        if self.opened_at is None:
+            return "closed"
+        now = time.monotonic() if now is None else now
+        return "half_open" if now - self.opened_at >= self.policy.reset_timeout else "open"
+
+    def available(self, now: float) -> bool:
+        state = self.state(now)
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def start(self) -> None:
+        self.outstanding += 1
+        if self.opened_at is not None:
+            self.probing = True
+
+    def succeeded(self) -> None:
+        self.outstanding -= 1
+        self.failures = 0
+        self.probing = False
+        if self.opened_at is not None:
+            METRICS.incr("breaker_closed", agent=self.agent_id)
+        self.opened_at = None
+
+    def failed(self) -> None:
+        self.outstanding -= 1
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.policy.failure_threshold:
+            if self.opened_at is None:
+                METRICS.incr("breaker_opened", agent=self.agent_id)
+            self.opened_at = time.monotonic()
+
+    def released(self) -> None:
+        # Cancelled (e.g. lost a hedge race) or not an endpoint fault: no health signal
+        self.outstanding -= 1
+        self.probing = False
+
+    def health(self) -> Dict[str, object]:
+        return {
+            "url": self.url,
+            "state": self.state(),
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.failures,
+        }
+
+
+class AgentEndpoints:
+    def __init__(self, agent_id: str, urls: Sequence[str], policy: ResiliencePolicy):
+        self.agent_id = agent_id
+        self.policy = policy
+        self.endpoints = [Endpoint(agent_id, url, policy) for url in urls]
+        self.latencies: Deque[float] = deque(maxlen=256)
+
+    def urls(self) -> List[str]:
+        return [ep.url for ep in self.endpoints]
+
+    def pick(self, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        # Least outstanding requests among endpoints whose breaker admits traffic;
+        # excluded (already tried) endpoints are only reused when nothing else is left
+        now = time.monotonic()
+        candidates = [ep for ep in self.endpoints if ep.available(now)]
+        fresh = [ep for ep in candidates if ep not in exclude] or candidates
+        if not fresh:
+            return None
+        # Ties prefer endpoints with fewer recent failures, then break randomly
+        best = min((ep.outstanding, ep.failures) for ep in fresh)
+        return random.choice([ep for ep in fresh if (ep.outstanding, ep.failures) == best])
+
+    def preferred_url(self) -> str:
+        picked = self.pick()
+        return picked.url if picked is not None else self.endpoints[0].url
+
+    def hedge_delay(self) -> Optional[float]:
+        # p95 of recent successful calls; no hedging until there is enough history
+        if len(self.latencies) < self.policy.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def health(self) -> List[Dict[str, object]]:
+        return [ep.health() for ep in self.endpoints]
+
+    async def _attempt(self, endpoint: Endpoint, send: Callable[[str], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        endpoint.start()
+        try:
+            result = await send(endpoint.url)
+        except asyncio.CancelledError:
+            endpoint.released()
+            raise
+        except RetryableError as exc:
+            if exc.failure:
+                endpoint.failed()
+            else:
+                endpoint.released()
+            raise
+        except Exception:
+            # Anything not classified above (bad request, decoding, validation) says nothing
+            # about the endpoint's health: only connection errors, timeouts and 5xx count
+            endpoint.released()
+            raise
+        endpoint.succeeded()
+        self.latencies.append(time.monotonic() - started)
+        return result
+
+    async def _hedged(
+        self, first: Endpoint, send: Callable[[str], Awaitable[T]], delay: float
+    ) -> T:
+        # Fire a second request at another endpoint if the first is slower than the p95;
+        # the first success wins and the other request is cancelled
+        primary = asyncio.ensure_future(self._attempt(first, send))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        second = self.pick(exclude=[first])
+        if second is None or second is first:
+            return await primary
+        METRICS.incr("remote_hedged", agent=self.agent_id)
+        pending = {primary, asyncio.ensure_future(self._attempt(second, send))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for job in done:
+                    if job.exception() is None:
+                        return job.result()
+                    error = job.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for job in pending:
+                job.cancel()
+
+    async def call(
+        self,
+        send: Callable[[str], Awaitable[T]],
+        idempotent: bool = True,
+        deadline: Optional[float] = None,
+        hedge: bool = True,
+    ) -> T:
+        # `send(base_url)` performs one attempt and raises RetryableError for transient
+        # failures; only idempotent calls are retried or hedged. `deadline` is epoch seconds.
+        tried: List[Endpoint] = []
+        attempts = self.policy.attempts if idempotent else 1
+        for attempt in range(attempts):
+            endpoint = self.pick(exclude=tried)
+            if endpoint is None:
+                METRICS.incr("breaker_rejected", agent=self.agent_id)
+                raise NoHealthyEndpoint(f"No healthy endpoint for {self.agent_id}")
+            tried.append(endpoint)
+            delay = self.hedge_delay() if idempotent and hedge and self.policy.hedge else None
+            try:
+                if delay is not None and len(self.endpoints) > 1:
+                    return await self._hedged(endpoint, send, delay)
+                return await self._attempt(endpoint, send)
+            except RetryableError as exc:
+                if attempt + 1 >= attempts:
+                    raise
+                retry_after = min(exc.retry_after or 0.0, self.policy.backoff_max)
+                pause = max(self.policy.backoff(attempt), retry_after)
+                if deadline is not None and time.time() + pause >= deadline:
+                    raise
+                METRICS.incr("remote_retries", agent=self.agent_id)
+                await asyncio.sleep(pause)
+        raise AssertionError("unreachable")
+
+
+class EndpointPool:
+    # Per-agent endpoint state, rebuilt when the registry's URLs for an agent change
+    def __init__(self, policy: Optional[ResiliencePolicy] = None):
+        self.policy = policy or ResiliencePolicy.from_env()
+        self._agents: Dict[str, AgentEndpoints] = {}
+
+    def get(self, agent_id: str, urls: Sequence[str]) -> AgentEndpoints:
+        current = self._agents.get(agent_id)
+        if current is None or current.urls() != list(urls):
+            current = AgentEndpoints(agent_id, urls, self.policy)
+            self._agents[agent_id] = current
+        return current
+
+    def health(self) -> Dict[str, List[Dict[str, object]]]:
+        return {agent_id: agent.health() for agent_id, agent in self._agents.items()}
@@ -0,0 +1,219 @@
+import abc
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.a2a_models import Event, Task, TaskResult
+
+_DEFAULT_PATH = os.path.join(".a2a", "tasks.sqlite")
+# Checkpoints older than this are deleted (A2A_TASK_STORE_MAX_AGE_S; 0 keeps everything)
+_DEFAULT_MAX_AGE_S = 86400.0
+# Pruning runs at most this often, from save_task
+_PRUNE_INTERVAL_S = 60.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def input_fingerprint(task: Task) -> str:
+    # A checkpoint is only reused for the same agent and the same input
+    payload: Dict[str, object] = {
+        "agent_id": task.agent_id,
+        "logs": hashlib.sha256(task.input.logs.encode("utf-8")).hexdigest(),
+        "context": task.input.context,
+    }
+    ref = task.input.log_ref
+    if ref is not None:
+        try:
+            stat = os.stat(ref.path)
+            payload["log_ref"] = [ref.path, stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            payload["log_ref"] = [ref.path]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class TaskStore(abc.ABC):
+    # Checkpoints keyed by task id (one per workflow step, e.g. "task-1:fix") and input
+    # fingerprint, so tasks that share an id but not their input never see each other's
+    @abc.abstractmethod
+    def save_task(self, task: Task) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_task(self, task_id: str) -> Optional[Task]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, task_id: str, fingerprint: str, result: TaskResult, events: List[Event]) -> None:
+        # Replaces the step's checkpoint with this result and the events that led to it
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_completed(self, task_id: str, fingerprint: str) -> Optional[Tuple[TaskResult, List[Event]]]:
+        raise NotImplementedError
+
+
+class MemoryTaskStore(TaskStore):
+    def __init__(self) -> None:
+        self._tasks: Dict[str, Task] = {}
+        self._results: Dict[Tuple[str, str], Tuple[TaskResult, List[Event]]] = {}
+        self._lock = threading.Lock()
+
+    def save_task(self, task: Task) -> None:
+        with self._lock:
+            self._tasks[task.id] = task
+
+    def load_task(self, task_id: str) -> Optional[Task]:
+        return self._tasks.get(task_id)
+
+    def complete(self, task_id: str, fingerprint: str, result: TaskResult, events: List[Event]) -> None:
+        with self._lock:
+            self._results[(task_id, fingerprint)] = (result, list(events))
+
+    def load_completed(self, task_id: str, fingerprint: str) -> Optional[Tuple[TaskResult, List[Event]]]:
+        with self._lock:
+            stored = self._results.get((task_id, fingerprint))
+            if stored is None:
+                return None
+            return stored[0], list(stored[1])
+
+
+class SQLiteTaskStore(TaskStore):
+    def __init__(self, path: str = _DEFAULT_PATH, max_age_s: float = _DEFAULT_MAX_AGE_S):
+        self.path = path
+        self.max_age_s = max_age_s
+        self._pruned_at = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Checkpoints from before they were keyed by input are dropped; those steps just run again
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(events)")]
+        if columns and "fingerprint" not in columns:
+            self._conn.executescript("DROP TABLE events; DROP TABLE results;")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS tasks (task_id TEXT PRIMARY KEY, task TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS events ("
+            " task_id TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, event TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS events_step ON events (task_id, fingerprint, seq);"
+            "CREATE TABLE IF NOT EXISTS results ("
+            " task_id TEXT NOT NULL, fingerprint TEXT NOT NULL, result TEXT NOT NULL,"
+            " PRIMARY KEY (task_id, fingerprint));"
+        )
+        # Write times for retention; files created before retention existed get the columns
+        # added, and their rows (NULL time) count as old
+        for table in ("tasks", "events", "results"):
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if "saved_at" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN saved_at REAL")
+
+    def save_task(self, task: Task) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, task, saved_at) VALUES (?, ?, ?)",
+                (task.id, task.model_dump_json(), time.time()),
+            )
+            self._maybe_prune_locked()
+
+    def prune(self, max_age_s: Optional[float] = None) -> int:
+        # Deletes tasks, events and results written more than max_age_s ago; returns rows removed
+        with self._lock:
+            return self._prune_locked(self.max_age_s if max_age_s is None else max_age_s)
+
+    def _maybe_prune_locked(self) -> None:
+        now = time.monotonic()
+        if self.max_age_s > 0 and now - self._pruned_at >= _PRUNE_INTERVAL_S:
+            self._pruned_at = now
+            self._prune_locked(self.max_age_s)
+
+    def _prune_locked(self, max_age_s: float) -> int:
+        cutoff = time.time() - max_age_s
+        removed = 0
+        for table in ("tasks", "events", "results"):
+            cursor = self._conn.execute(
+                f"DELETE FROM {table} WHERE COALESCE(saved_at, 0) < ?", (cutoff,)
+            )
+            removed += cursor.rowcount
+        return removed
+
+    def load_task(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            row = self._conn.execute("SELECT task FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return Task.model_validate_json(row[0]) if row else None
+
+    def complete(self, task_id: str, fingerprint: str, result: TaskResult, events: List[Event]) -> None:
+        # One transaction per step, so a replay never sees half a checkpoint
+        now = time.time()
+        rows = [(task_id, fingerprint, event.model_dump_json(), now) for event in events]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "DELETE FROM events WHERE task_id = ? AND fingerprint = ?", (task_id, fingerprint)
+                )
+                self._conn.executemany(
+                    "INSERT INTO events (task_id, fingerprint, event, saved_at) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (task_id, fingerprint, result, saved_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (task_id, fingerprint, result.model_dump_json(), now),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def load_completed(self, task_id: str, fingerprint: str) -> Optional[Tuple[TaskResult, List[Event]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE task_id = ? AND fingerprint = ?", (task_id, fingerprint)
+            ).fetchone()
+            if row is None:
+                return None
+            events = self._conn.execute(
+                "SELECT event FROM events WHERE task_id = ? AND fingerprint = ? ORDER BY seq",
+                (task_id, fingerprint),
+            ).fetchall()
+        return TaskResult.model_validate_json(row[0]), [Event.model_validate_json(e[0]) for e in events]
+
+
+def store_from_env() -> Optional[TaskStore]:
+    mode = os.getenv("A2A_TASK_STORE", "sqlite").lower()
+    if mode in ("", "0", "off", "none", "false"):
+        return None
+    if mode == "memory":
+        return MemoryTaskStore()
+    return SQLiteTaskStore(
+        os.getenv("A2A_TASK_STORE_PATH", _DEFAULT_PATH),
+        max_age_s=_env_float("A2A_TASK_STORE_MAX_AGE_S", _DEFAULT_MAX_AGE_S),
+    )
+
+
+_UNSET = object()
+_TASK_STORE = _UNSET
+
+
+def get_task_store() -> Optional[TaskStore]:
+    global _TASK_STORE
+    if _TASK_STORE is _UNSET:
+        _TASK_STORE = store_from_env()
+    return _TASK_STORE  # type: ignore[return-value]
+
+
+def set_task_store(store: Optional[TaskStore]) -> None:
+    global _TASK_STORE
+    _TASK_STORE = store
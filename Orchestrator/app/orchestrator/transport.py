@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional
+
+import httpx
+
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    _HAS_H2 = True
+except Exception:
+    _HAS_H2 = False
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class PoolConfig:
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        # HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+        self.http2 = http2 and _HAS_H2
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=int(_env_float("A2A_HTTP_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(_env_float("A2A_HTTP_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=_env_float("A2A_HTTP_KEEPALIVE_EXPIRY", 30.0),
+            http2=os.getenv("A2A_HTTP2", "1").lower() not in ("0", "false", "no"),
+            timeout=_env_float("A2A_HTTP_TIMEOUT", 60.0),
+            connect_timeout=_env_float("A2A_HTTP_CONNECT_TIMEOUT", 10.0),
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class ClientPool:
+    # httpx.AsyncClient is bound to the loop it first runs on, so clients are kept per loop
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig.from_env()
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            per_loop = self._clients.setdefault(loop, {})
+            client = per_loop.get(base_url)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    base_url=base_url,
+                    limits=self.config.limits(),
+                    http2=self.config.http2,
+                    timeout=httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout),
+                )
+                per_loop[base_url] = client
+        return client
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = list(self._clients.pop(loop, {}).values())
+        for client in clients:
+            await client.aclose()
+
+
+CLIENT_POOL = ClientPool()
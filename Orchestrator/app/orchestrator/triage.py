@@ -0,0 +1,75 @@
+import argparse
+import json
+import sys
+from typing import IO, Iterator, List
+
+from pydantic import ValidationError
+
+from app.core.a2a_models import Task, TaskInput
+from app.orchestrator.executor import execute_many
+
+# Offline bulk triage: one JSON object per input line, e.g.
+#   {"id": "cam-17", "logs": "...", "context": {...}, "agent_id": "diagnoser"}
+# Only "logs" is required. Results are written as JSONL in completion order. Lines that cannot
+# be turned into a task are reported on stderr and skipped, and the exit status is 1.
+
+
+def _read_tasks(lines: IO[str], default_agent: str, skipped: List[int]) -> Iterator[Task]:
+    for n, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("expected a JSON object")
+            if "logs" not in item:
+                raise ValueError('missing "logs"')
+            task = Task(
+                id=str(item.get("id") or f"line-{n}"),
+                agent_id=item.get("agent_id") or default_agent,
+                input=TaskInput(logs=item["logs"], context=item.get("context")),
+            )
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            skipped.append(n)
+            print(f"line {n}: skipped: {errors}", file=sys.stderr)
+            continue
+        except ValueError as e:
+            skipped.append(n)
+            print(f"line {n}: skipped: {e}", file=sys.stderr)
+            continue
+        yield task
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Triage a JSONL file of camera logs through the agent chain.")
+    parser.add_argument("input", help="JSONL file of logs ('-' for stdin)")
+    parser.add_argument("output", help="JSONL file for results ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--agent", default="diagnoser", help="Entry agent when a line has no agent_id")
+    args = parser.parse_args(argv)
+
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    skipped: List[int] = []
+    try:
+        tasks = _read_tasks(src, args.agent, skipped)
+        for task, result in execute_many(tasks, concurrency=args.concurrency):
+            failed += result.status == "error"
+            record = {"id": task.id, "agent_id": task.agent_id, **result.model_dump()}
+            dst.write(json.dumps(record, default=str) + "\n")
+            dst.flush()
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    if skipped:
+        print(f"{len(skipped)} malformed line(s) skipped", file=sys.stderr)
+    return 1 if failed or skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
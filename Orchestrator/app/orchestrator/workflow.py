@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Sequence, Union
+
+from app.core.a2a_models import Event, Task, TaskInput, TaskResult
+
+Condition = Union[Callable[[Dict[str, TaskResult]], bool], Dict[str, Union[str, List[str]]]]
+MergeRule = Union[str, Callable[[Optional[Dict[str, Any]], List[TaskResult]], Dict[str, Any]]]
+# (task, outcome, stream, emit_completed) -> events; supplied by the executor
+StepRunner = Callable[..., AsyncGenerator[Event, None]]
+
+
+class RunOutcome:
+    # Async generators cannot return a value, so the final TaskResult is handed back here.
+    # `aborted` marks runs that never produced an agent result (unknown agent, crash).
+    def __init__(self) -> None:
+        self.result: Optional[TaskResult] = None
+        self.aborted = False
+
+
+def merge_contexts(base: Optional[Dict[str, Any]], results: List[TaskResult]) -> Dict[str, Any]:
+    # Default rule: the task's context, then each dependency's context in declaration order
+    merged = dict(base or {})
+    for result in results:
+        merged.update(result.details.get("context") or {})
+    return merged
+
+
+def merge_diagnoses(base: Optional[Dict[str, Any]], results: List[TaskResult]) -> Dict[str, Any]:
+    # Join rule for parallel diagnosers: concatenate their issues and summaries
+    merged = merge_contexts(base, results)
+    issues: List[Dict[str, Any]] = []
+    summaries: List[str] = []
+    for result in results:
+        diagnosis = (result.details.get("context") or {}).get("diagnosis") or {}
+        issues.extend(diagnosis.get("issues") or [])
+        if diagnosis.get("summary"):
+            summaries.append(diagnosis["summary"])
+    if issues or summaries:
+        merged["diagnosis"] = {"issues": issues, "summary": "\n\n".join(summaries)}
+    return merged
+
+
+MERGE_RULES: Dict[str, Callable[[Optional[Dict[str, Any]], List[TaskResult]], Dict[str, Any]]] = {
+    "merge": merge_contexts,
+    "base": lambda base, results: dict(base or {}),
+    "diagnoses": merge_diagnoses,
+}
+
+
+class Step:
+    def __init__(
+        self,
+        id: str,
+        agent_id: str,
+        after: Sequence[str] = (),
+        when: Optional[Condition] = None,
+        merge: MergeRule = "merge",
+        label: Optional[str] = None,
+    ):
+        self.id = id
+        self.agent_id = agent_id
+        self.after = list(after)
+        self.when = when
+        self.merge = merge
+        self.label = label or agent_id.capitalize()
+
+    def should_run(self, results: Dict[str, TaskResult]) -> bool:
+        if self.when is None:
+            return True
+        if callable(self.when):
+            return bool(self.when(results))
+        for step_id, expected in self.when.items():
+            allowed = [expected] if isinstance(expected, str) else list(expected)
+            result = results.get(step_id)
+            if result is None or result.status not in allowed:
+                return False
+        return True
+
+    def build_context(self, base: Optional[Dict[str, Any]], results: List[TaskResult]) -> Dict[str, Any]:
+        rule = MERGE_RULES[self.merge] if isinstance(self.merge, str) else self.merge
+        return rule(base, results)
+
+
+class Workflow:
+    def __init__(self, name: str, steps: List[Step]):
+        self.name = name
+        self.steps = _topological(steps)
+        self.roots = [s for s in self.steps if not s.after]
+
+    @classmethod
+    def single(cls, agent_id: str) -> "Workflow":
+        return cls(agent_id, [Step(agent_id, agent_id)])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Workflow":
+        steps = [
+            Step(
+                id=item["id"],
+                agent_id=item.get("agent") or item.get("agent_id") or item["id"],
+                after=item.get("after", []),
+                when=item.get("when"),
+                merge=item.get("merge", "merge"),
+                label=item.get("label"),
+            )
+            for item in data["steps"]
+        ]
+        return cls(data.get("name", "workflow"), steps)
+
+    async def run(
+        self, task: Task, run_step: StepRunner, outcome: RunOutcome, stream: bool = False
+    ) -> AsyncGenerator[Event, None]:
+        # Every step whose dependencies are done and whose condition holds starts at once;
+        # events from concurrent branches are interleaved in arrival order.
+        started = time.monotonic()
+        inbox: "asyncio.Queue[tuple]" = asyncio.Queue()
+        results: Dict[str, TaskResult] = {}
+        state = {s.id: "pending" for s in self.steps}
+        running: Dict[str, "asyncio.Task[None]"] = {}
+        finished: List[Step] = []
+
+        async def drive(step: Step, step_task: Task, is_root: bool) -> None:
+            step_outcome = RunOutcome()
+            try:
+                if not is_root:
+                    requested = Event(
+                        type="delegation.requested",
+                        message=f"Delegating to {step.label}",
+                        data={"to": step.agent_id},
+                    )
+                    await inbox.put(("event", requested))
+                async for event in run_step(step_task, step_outcome, stream, not is_root):
+                    await inbox.put(("event", event))
+                if not is_root and step_outcome.result is not None:
+                    result = step_outcome.result
+                    completed = Event.lazy(
+                        "delegation.completed",
+                        f"{step.label} finished",
+                        result.model_dump,
+                        result.brief,
+                    )
+                    await inbox.put(("event", completed))
+            except Exception as e:  # noqa: BLE001
+                step_outcome.result = TaskResult(status="error", summary="Agent error", details={"error": str(e)})
+                step_outcome.aborted = True
+            await inbox.put(("done", step, step_outcome))
+
+        def launch_ready() -> None:
+            for step in self.steps:
+                if state[step.id] != "pending":
+                    continue
+                if any(state[d] in ("pending", "running") for d in step.after):
+                    continue
+                if any(state[d] == "skipped" for d in step.after) or not step.should_run(results):
+                    state[step.id] = "skipped"
+                    continue
+                is_root = not step.after
+                step_id = task.id if is_root and len(self.roots) == 1 else f"{task.id}:{step.id}"
+                context = step.build_context(task.input.context, [results[d] for d in step.after])
+                step_input = TaskInput(
+                    logs=task.input.logs,
+                    log_ref=task.input.log_ref,
+                    context=context,
+                    idempotency_key=f"{task.input.idempotency_key or task.id}:{step.id}",
+                )
+                state[step.id] = "running"
+                step_task = Task(
+                    id=step_id,
+                    agent_id=step.agent_id,
+                    input=step_input,
+                    deadline=task.deadline,
+                    trace_parent=task.trace_parent,
+                    priority=task.priority,
+                )
+                running[step.id] = asyncio.ensure_future(drive(step, step_task, is_root))
+
+        try:
+            launch_ready()
+            while running:
+                message = await inbox.get()
+                if message[0] == "event":
+                    yield message[1]
+                    continue
+                _, step, step_outcome = message
+                running.pop(step.id, None)
+                state[step.id] = "done"
+                if step_outcome.aborted and not step.after:
+                    # A root step that could not run at all ends the workflow, as before
+                    outcome.result = step_outcome.result
+                    outcome.aborted = True
+                    return
+                results[step.id] = step_outcome.result or TaskResult(status="error", summary="No result", details={})
+                finished.append(step)
+                launch_ready()
+        finally:
+            for job in running.values():
+                job.cancel()
+
+        final = max(finished, key=self.steps.index)
+        if len(self.steps) == 1:
+            message = "Task completed"
+        elif len(finished) == len(self.steps):
+            message = "Task fully completed"
+        else:
+            message = f"Task completed with {final.label} result"
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        yield Event(type="task.completed", message=message, data={"duration_ms": duration_ms})
+        outcome.result = results[final.id]
+
+
+def _topological(steps: List[Step]) -> List[Step]:
+    by_id = {s.id: s for s in steps}
+    if len(by_id) != len(steps):
+        raise ValueError("Workflow step ids must be unique")
+    ordered: List[Step] = []
+    marks: Dict[str, str] = {}
+
+    def visit(step: Step) -> None:
+        if marks.get(step.id) == "done":
+            return
+        if marks.get(step.id) == "visiting":
+            raise ValueError(f"Workflow has a cycle through step '{step.id}'")
+        marks[step.id] = "visiting"
+        for dep in step.after:
+            if dep not in by_id:
+                raise ValueError(f"Step '{step.id}' depends on unknown step '{dep}'")
+            visit(by_id[dep])
+        marks[step.id] = "done"
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+    return ordered
+
+
+# Diagnoser -> Fixer -> Support (only when Fixer asks for it): the original delegation policy
+DEFAULT_WORKFLOW = Workflow(
+    "default",
+    [
+        Step("diagnose", "diagnoser"),
+        Step("fix", "fixer", after=["diagnose"]),
+        Step("support", "support", after=["fix"], when={"fix": "needs_support"}),
+    ],
+)
+
+WORKFLOWS: Dict[str, Workflow] = {"diagnoser": DEFAULT_WORKFLOW}
+
+
+def load_workflows(path: str) -> Dict[str, Workflow]:
+    # JSON file mapping entry agent ids to workflow declarations ({"name": ..., "steps": [...]})
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {agent_id: Workflow.from_dict(spec) for agent_id, spec in data.items()}
+
+
+if os.getenv("A2A_WORKFLOWS"):
+    WORKFLOWS.update(load_workflows(os.environ["A2A_WORKFLOWS"]))
+
+
+def workflow_for(agent_id: str) -> Workflow:
+    return WORKFLOWS.get(agent_id) or Workflow.single(agent_id)
@@ -1,36 +1,430 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+import json
+import os
+import time
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
 from app.core.a2a_models import TaskInput, TaskResult, AgentCard
-from app.agents import diagnoser, fixer, support
+from app.core import llm_scheduler, tracing, wire
+from app.core.metrics import METRICS
+from app.core.logs import discard, spool_chunks_async
+from app.core.singleflight import SingleFlight, coalesce_key
+from app.agents.loader import LazyAgents, selected_agents
+from app.server.limits import (
+    DEADLINE_HEADER,
+    AgentLimiter,
+    DeadlineExceeded,
+    Overloaded,
+    limiters_from_env,
+    timeout_from_header,
+)
 
 app = FastAPI(title="Agent Server")
 
-AGENTS = {
-    "diagnoser": diagnoser,
-    "fixer": fixer,
-    "support": support,
-}
+# Only the agents named in A2A_AGENTS (default: all), each imported on its first request,
+# so a host started with A2A_AGENTS=diagnoser never loads the Fixer or Support code
+AGENTS = LazyAgents(selected_agents())
+
+LIMITERS: Dict[str, AgentLimiter] = limiters_from_env(AGENTS)
+
+BATCH_CONCURRENCY = int(os.getenv("A2A_BATCH_CONCURRENCY", "8"))
+
+# Largest JSON header line accepted in front of an uploaded log
+UPLOAD_HEADER_MAX_BYTES = int(os.getenv("A2A_UPLOAD_HEADER_MAX_BYTES", str(64 * 1024)))
+
+FLIGHTS = SingleFlight("server")
 
 
 class RunRequest(BaseModel):
     logs: str
     context: Optional[Dict[str, Any]] = None
+    idempotency_key: Optional[str] = None
+
+    def to_input(self) -> TaskInput:
+        return TaskInput(logs=self.logs, context=self.context, idempotency_key=self.idempotency_key)
+
+
+@app.middleware("http")
+async def _advertise_formats(request: Request, call_next):
+    # Lets clients switch request bodies to msgpack / compressed encodings
+    response = await call_next(request)
+    for name, value in wire.capability_headers().items():
+        response.headers.setdefault(name, value)
+    return response
+
+
+@app.middleware("http")
+async def _llm_priority(request: Request, call_next):
+    # Bulk callers (X-A2A-Priority: bulk) queue behind interactive ones for the LLM quota
+    with llm_scheduler.caller(priority=request.headers.get(llm_scheduler.PRIORITY_HEADER)):
+        return await call_next(request)
+
+
+def _respond(request: Request, payload: Any, status_code: int = 200, headers=None) -> Response:
+    # Response body in the best encoding the client accepts (JSON by default)
+    media_type, encoding = wire.negotiate(
+        request.headers.get("accept"), request.headers.get("accept-encoding")
+    )
+    body, body_headers = wire.encode(payload, media_type, encoding)
+    body_headers["Vary"] = "Accept, Accept-Encoding"
+    body_headers.update(headers or {})
+    return Response(body, status_code=status_code, headers=body_headers)
+
+
+async def _read_payload(request: Request) -> Any:
+    try:
+        return wire.decode(
+            await request.body(),
+            request.headers.get("content-type"),
+            request.headers.get("content-encoding"),
+        )
+    except Exception as e:  # noqa: BLE001
+        raise RequestValidationError([{"loc": ["body"], "msg": str(e), "type": "value_error"}])
+
+
+async def _read_run(request: Request) -> RunRequest:
+    try:
+        return RunRequest.model_validate(await _read_payload(request))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+@app.exception_handler(Overloaded)
+async def _overloaded(request: Request, exc: Overloaded):
+    METRICS.incr("server_rejected", agent=exc.agent_id, status="429")
+    result = TaskResult(status="error", summary=str(exc), details={"retry_after": exc.retry_after})
+    headers = {"Retry-After": str(exc.retry_after)}
+    return _respond(request, result.model_dump(), status_code=429, headers=headers)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def _deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    METRICS.incr("server_rejected", status="504")
+    result = TaskResult(status="error", summary="Deadline exceeded", details={})
+    return _respond(request, result.model_dump(), status_code=504)
+
+
+async def _invoke(agent_id: str, input_data: TaskInput) -> TaskResult:
+    # Agents with run_async await the LLM without holding a worker thread
+    module = AGENTS[agent_id]
+    started = time.perf_counter()
+    try:
+        with tracing.span("agent.run", agent=agent_id), llm_scheduler.caller(agent_id):
+            if hasattr(module, "run_async"):
+                result = await module.run_async(input_data)
+            else:
+                result = await run_in_threadpool(module.run, input_data)
+    except Exception:
+        METRICS.incr("agent_errors", agent=agent_id, layer="server")
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        METRICS.observe("agent_run_seconds", elapsed, agent=agent_id, layer="server")
+    if result.status == "error":
+        METRICS.incr("agent_errors", agent=agent_id, layer="server")
+    return result
+
+
+def _release_when_done(
+    job: "asyncio.Future[Any]", agent_id: str, began: float, cleanup: Optional[Callable[[], None]] = None
+) -> None:
+    # A run abandoned at its deadline keeps its worker busy, so its slot is only given back
+    # (and its input cleaned up) once the work has really ended; otherwise the admission limit
+    # could be exceeded, or a spooled upload deleted while the agent still reads it
+    loop = asyncio.get_running_loop()
+    limiter = LIMITERS[agent_id]
+
+    def release(_: Any) -> None:
+        if not job.cancelled():
+            job.exception()  # retrieved here when nobody awaits the abandoned run
+        limiter.release(loop.time() - began)
+        if cleanup:
+            cleanup()
+
+    if job.done():
+        release(job)
+    else:
+        job.add_done_callback(release)
+
+
+async def _run_limited(
+    agent_id: str,
+    input_data: TaskInput,
+    timeout: Optional[float],
+    reject_when_full: bool = True,
+    cleanup: Optional[Callable[[], None]] = None,
+) -> TaskResult:
+    # `cleanup` runs once the run is over, or right away when it never gets a slot
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        await LIMITERS[agent_id].acquire(timeout, reject_when_full=reject_when_full)
+    except BaseException:
+        if cleanup:
+            cleanup()
+        raise
+    began = loop.time()
+    job = asyncio.ensure_future(_invoke(agent_id, input_data))
+    try:
+        remaining = None if timeout is None else timeout - (began - started)
+        # Shielded: the caller stops waiting at the deadline, the run itself is not cut short
+        return await asyncio.wait_for(asyncio.shield(job), remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+    finally:
+        _release_when_done(job, agent_id, began, cleanup)
+
+
+async def _run_coalesced(
+    agent_id: str,
+    input_data: TaskInput,
+    timeout: Optional[float],
+    reject_when_full: bool = True,
+) -> TaskResult:
+    # Identical concurrent requests share one run (and one agent slot)
+    key = coalesce_key(agent_id, input_data)
+    result, _ = await FLIGHTS.do(
+        key,
+        lambda: _run_limited(agent_id, input_data, timeout, reject_when_full=reject_when_full),
+        agent=agent_id,
+    )
+    return result
+
+
+def _card_etag(card: AgentCard) -> str:
+    return '"' + hashlib.sha256(card.model_dump_json().encode("utf-8")).hexdigest()[:16] + '"'
 
 
 @app.get("/agent/{agent_id}/card", response_model=AgentCard)
-def get_card(agent_id: str):
+async def get_card(agent_id: str, request: Request, response: Response):
     if agent_id not in AGENTS:
         return AgentCard(id=agent_id, name=agent_id, description="Unknown agent", capabilities=[])
-    return AGENTS[agent_id].get_agent_card()
+    card = AGENTS[agent_id].get_agent_card()
+    etag = _card_etag(card)
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return card
+
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text format: latency histograms, LLM token counts, error counters per agent
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def _parent(request: Request) -> Optional[str]:
+    return request.headers.get(tracing.TRACEPARENT)
+
+
+@app.get("/agent/{agent_id}/load")
+async def get_load(agent_id: str):
+    if agent_id not in LIMITERS:
+        return {}
+    return LIMITERS[agent_id].stats()
 
 
 @app.post("/agent/{agent_id}/run", response_model=TaskResult)
-def run(agent_id: str, req: RunRequest):
+async def run(agent_id: str, request: Request):
+    # Body: RunRequest as JSON or msgpack, optionally gzip/zstd encoded
+    req = await _read_run(request)
     if agent_id not in AGENTS:
-        return TaskResult(status="error", summary="Unknown agent", details={})
-    module = AGENTS[agent_id]
-    return module.run(TaskInput(logs=req.logs, context=req.context))
+        unknown = TaskResult(status="error", summary="Unknown agent", details={})
+        return _respond(request, unknown.model_dump())
+    timeout = timeout_from_header(request.headers.get(DEADLINE_HEADER))
+    with tracing.span("agent_server.run", parent=_parent(request), agent=agent_id):
+        result = await _run_coalesced(agent_id, req.to_input(), timeout)
+    return _respond(request, result.model_dump())
+
+
+@app.post("/agent/{agent_id}/run_batch", response_model=List[TaskResult])
+async def run_batch(agent_id: str, request: Request):
+    # Results are returned in request order; a failing item does not fail the batch.
+    # Items wait for agent slots rather than being rejected, at most A2A_BATCH_CONCURRENCY at once.
+    payload = await _read_payload(request)
+    try:
+        reqs = [RunRequest.model_validate(item) for item in payload]
+    except (TypeError, ValidationError) as e:
+        raise RequestValidationError([{"loc": ["body"], "msg": str(e), "type": "value_error"}])
+    if agent_id not in AGENTS:
+        unknown = TaskResult(status="error", summary="Unknown agent", details={}).model_dump()
+        return _respond(request, [unknown for _ in reqs])
+    timeout = timeout_from_header(request.headers.get(DEADLINE_HEADER))
+    batch_slots = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+
+    async def run_one(req: RunRequest) -> TaskResult:
+        async with batch_slots:
+            try:
+                return await _run_coalesced(
+                    agent_id, req.to_input(), timeout, reject_when_full=False
+                )
+            except DeadlineExceeded:
+                return TaskResult(status="error", summary="Deadline exceeded", details={})
+            except Exception as e:  # noqa: BLE001
+                return TaskResult(status="error", summary="Agent error", details={"error": str(e)})
+
+    parent = _parent(request)
+    with tracing.span("agent_server.run_batch", parent=parent, agent=agent_id, size=len(reqs)):
+        results = await asyncio.gather(*(run_one(req) for req in reqs))
+    return _respond(request, [result.model_dump() for result in results])
+
+
+def _ndjson_line(payload: Dict[str, Any]) -> bytes:
+    return (json.dumps(payload) + "\n").encode("utf-8")
+
+
+async def _stream_run(
+    agent_id: str,
+    input_data: TaskInput,
+    timeout: Optional[float],
+    span: tracing.Span,
+    cleanup: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[bytes]:
+    # Caller holds an agent slot; it is released (and `cleanup` run) when the agent's worker
+    # thread finishes, which may be after the stream ends. Deltas hop onto the loop in order; None marks the end.
+    loop = asyncio.get_running_loop()
+    began = loop.time()
+    deltas: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+    def on_delta(text: str) -> None:
+        loop.call_soon_threadsafe(deltas.put_nowait, text)
+
+    run = AGENTS[agent_id].run
+    with span.activate(), llm_scheduler.caller(agent_id):
+        job = asyncio.ensure_future(run_in_threadpool(run, input_data, on_delta=on_delta))
+    job.add_done_callback(lambda _: deltas.put_nowait(None))
+    try:
+        while True:
+            remaining = None if timeout is None else timeout - (loop.time() - began)
+            try:
+                piece = await asyncio.wait_for(deltas.get(), remaining)
+            except asyncio.TimeoutError:
+                result = TaskResult(status="error", summary="Deadline exceeded", details={})
+                yield _ndjson_line({"type": "result", "result": result.model_dump()})
+                return
+            if piece is None:
+                break
+            yield _ndjson_line({"type": "delta", "text": piece})
+        try:
+            result = job.result()
+        except Exception as e:  # noqa: BLE001
+            result = TaskResult(status="error", summary="Agent error", details={"error": str(e)})
+        if result.status == "error":
+            METRICS.incr("agent_errors", agent=agent_id, layer="server")
+        yield _ndjson_line({"type": "result", "result": result.model_dump()})
+    finally:
+        METRICS.observe("agent_run_seconds", loop.time() - began, agent=agent_id, layer="server")
+        _release_when_done(job, agent_id, began, cleanup)
+
+
+async def _streaming_response(
+    request: Request, agent_id: str, input_data: TaskInput, timeout: Optional[float], cleanup=None
+):
+    # Acquire the slot before responding so an overloaded agent can still answer 429
+    try:
+        await LIMITERS[agent_id].acquire(timeout)
+    except Exception:
+        if cleanup:
+            cleanup()
+        raise
+    parent = _parent(request)
+    span = tracing.start_span("agent_server.run", parent=parent, agent=agent_id, stream=True)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for line in _stream_run(agent_id, input_data, timeout, span, cleanup):
+                yield line
+        finally:
+            span.end()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.post("/agent/{agent_id}/run/stream")
+async def run_stream(agent_id: str, request: Request):
+    # NDJSON: zero or more {"type": "delta", "text": ...} lines, then one {"type": "result", ...}
+    req = await _read_run(request)
+    if agent_id not in AGENTS:
+        result = TaskResult(status="error", summary="Unknown agent", details={})
+        return StreamingResponse(
+            iter([_ndjson_line({"type": "result", "result": result.model_dump()})]),
+            media_type="application/x-ndjson",
+        )
+    timeout = timeout_from_header(request.headers.get(DEADLINE_HEADER))
+    return await _streaming_response(request, agent_id, req.to_input(), timeout)
+
+
+async def _split_upload(body: AsyncIterator[bytes]) -> Tuple[Dict[str, Any], AsyncIterator[bytes]]:
+    # Upload framing: first line is a JSON header ({"context": ...}), the rest is raw log bytes
+    buffered = b""
+    async for chunk in body:
+        buffered += chunk
+        if b"\n" in buffered:
+            break
+        if len(buffered) > UPLOAD_HEADER_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Upload header line too large")
+    header_line, _, rest = buffered.partition(b"\n")
+    if len(header_line) > UPLOAD_HEADER_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Upload header line too large")
+    header = json.loads(header_line or b"{}")
+
+    async def remainder() -> AsyncIterator[bytes]:
+        if rest:
+            yield rest
+        async for chunk in body:
+            yield chunk
+
+    return header, remainder()
+
+
+@app.post("/agent/{agent_id}/run/upload")
+async def run_upload(agent_id: str, request: Request, stream: bool = False):
+    # Chunked log upload: the body is spooled to disk and the agent reads it line by line
+    if agent_id not in AGENTS:
+        unknown = TaskResult(status="error", summary="Unknown agent", details={})
+        return _respond(request, unknown.model_dump())
+    timeout = timeout_from_header(request.headers.get(DEADLINE_HEADER))
+    started = time.monotonic()
+    encoding = request.headers.get("content-encoding")
+    try:
+        header, body = await _split_upload(wire.adecompress_stream(request.stream(), encoding))
+        if not isinstance(header, dict):
+            raise ValueError("upload header must be a JSON object")
+    except ValueError as e:
+        raise RequestValidationError([{"loc": ["body"], "msg": str(e), "type": "value_error"}])
+    ref = await spool_chunks_async(body)
+    # The spool file is ours until a run takes it over; the run deletes it once the agent is
+    # done with it, which may be after a deadline response
+    handed_off = False
+    try:
+        try:
+            input_data = TaskInput(
+                log_ref=ref,
+                context=header.get("context"),
+                idempotency_key=header.get("idempotency_key"),
+            )
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        if timeout is not None:
+            timeout -= time.monotonic() - started
+        cleanup = lambda: discard(ref)  # noqa: E731
+        handed_off = True
+        if stream:
+            return await _streaming_response(
+                request, agent_id, input_data, timeout, cleanup=cleanup
+            )
+        with tracing.span("agent_server.run", parent=_parent(request), agent=agent_id, upload=True):
+            result = await _run_limited(agent_id, input_data, timeout, cleanup=cleanup)
+        return _respond(request, result.model_dump())
+    finally:
+        if not handed_off:
+            discard(ref)
 
 # To run locally on a machine dedicating a specific agent, use:
 # uvicorn app.server.agent_server:app --host 0.0.0.0 --port 9001
+# Add --workers N to run N worker processes; the per-agent limits above apply per process.
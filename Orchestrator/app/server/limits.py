@@ -0,0 +1,72 @@
+import asyncio
+import math
+import os
+from typing import Dict, Optional
+
+DEADLINE_HEADER = "X-A2A-Timeout-Ms"
+
+
+class Overloaded(Exception):
+    def __init__(self, agent_id: str, retry_after: int):
+        super().__init__(f"Agent {agent_id} is overloaded")
+        self.agent_id = agent_id
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class AgentLimiter:
+    # At most `concurrency` runs in flight per agent (per worker process); up to `max_queue`
+    # more wait their turn; anything beyond that is rejected so the caller can back off.
+    def __init__(self, agent_id: str, concurrency: int, max_queue: int):
+        self.agent_id = agent_id
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.active = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._avg_service_s = 1.0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil((self.waiting + 1) * self._avg_service_s / self.concurrency))
+
+    async def acquire(self, timeout: Optional[float] = None, reject_when_full: bool = True) -> None:
+        if reject_when_full and self._slots.locked() and self.waiting >= self.max_queue:
+            raise Overloaded(self.agent_id, self.retry_after())
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceeded()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded() from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self, service_s: Optional[float] = None) -> None:
+        self.active -= 1
+        self._slots.release()
+        if service_s is not None:
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * service_s
+
+    def stats(self) -> Dict[str, float]:
+        return {"active": self.active, "waiting": self.waiting, "concurrency": self.concurrency}
+
+
+def limiters_from_env(agent_ids) -> Dict[str, AgentLimiter]:
+    concurrency = int(os.getenv("A2A_SERVER_CONCURRENCY", "8"))
+    max_queue = int(os.getenv("A2A_SERVER_QUEUE", "32"))
+    return {agent_id: AgentLimiter(agent_id, concurrency, max_queue) for agent_id in agent_ids}
+
+
+def timeout_from_header(value: Optional[str]) -> Optional[float]:
+    # The orchestrator sends its remaining budget in ms; relative, so clock skew is harmless
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value) / 1000)
+    except ValueError:
+        return None
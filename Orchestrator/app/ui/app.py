@@ -23,6 +23,7 @@ with st.sidebar:
     st.header("Run Settings")
     entry_agent = st.selectbox("Entry Agent", options=["diagnoser", "fixer", "support"], index=0)
     task_id = st.text_input("Task ID", value="task-1")
+    stream_output = st.checkbox("Stream agent output", value=True)
     st.caption("If agents.local.json is present, agents will be called remotely over HTTP.")
 
 sample_logs = (
@@ -48,24 +49,39 @@ with col_fix:
     fix_box = st.container(border=True)
 with col_support:
     support_box = st.container(border=True)
+agent_boxes = {"diagnoser": diag_box, "fixer": fix_box, "support": support_box}
 
 if run:
     task = Task(id=task_id, agent_id=entry_agent, input=TaskInput(logs=logs, context=context))
     with st.status("Running...", expanded=True) as status:
         st.write("Task created and started")
-        gen = execute(task)
+        gen = execute(task, stream=stream_output)
         result = None
+        streamed = {}
+        live = {}
         try:
             while True:
                 event = next(gen)
+                if event.type == "agent.delta":
+                    # Render tokens as they arrive instead of waiting for agent.completed
+                    agent_id = event.data.get("agent_id")
+                    streamed[agent_id] = streamed.get(agent_id, "") + event.data.get("text", "")
+                    if agent_id in agent_boxes:
+                        if agent_id not in live:
+                            live[agent_id] = agent_boxes[agent_id].empty()
+                        live[agent_id].markdown(streamed[agent_id])
+                    continue
+                data = event.payload()
+                # ts_mono is on every event; only show the block when there is more than that
+                shown = {k: v for k, v in data.items() if k != "ts_mono"}
                 with placeholder.container():
                     st.write(f"[{event.type}] {event.message}")
-                    if event.data:
-                        st.code(str(event.data))
+                    if shown:
+                        st.code(str(shown))
                 # Show intermediate per-agent results
-                if event.type == "agent.completed" and event.data:
-                    agent_id = event.data.get("agent_id")
-                    result = event.data.get("result")
+                if event.type == "agent.completed" and data:
+                    agent_id = data.get("agent_id")
+                    result = data.get("result")
                     if agent_id == "diagnoser" and result:
                         with diag_box:
                             st.subheader("Diagnoser Result")
@@ -0,0 +1,305 @@
+# End-to-end benchmark: the full executor (workflow, delegation, agents) against the fake
+# LLM backend, either in-process ("local") or against three agent_server processes started
+# here, one per agent ("remote"). Every (mode, concurrency, log size) cell runs in a fresh
+# subprocess so peak RSS is per cell. Prints one JSON document for regression tracking.
+#
+#   python benchmarks/bench_e2e.py [--modes local,remote] [--concurrency 1,8,32]
+#       [--tasks 64] [--log-kb 4,256] [--mix diagnoser=0.8,fixer=0.15,support=0.05]
+#       [--latency lognormal:200,0.4] [--tokens-per-s 0] [--escalate 0.2] [--seed 1]
+#       [--output results.json]
+#
+# Stages reported per cell: "card" (remote card lookup), one per agent (agent.started ->
+# agent.completed, i.e. including the network hop in remote mode) and "task" (end to end).
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+AGENTS = ["diagnoser", "fixer", "support"]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": round(_percentile(values, 50), 1),
+        "p95_ms": round(_percentile(values, 95), 1),
+        "p99_ms": round(_percentile(values, 99), 1),
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _proc_peak_rss_mb(pid: int) -> float:
+    # High-water mark of another process; Linux only
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+def _parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        agent, _, weight = part.partition("=")
+        if agent.strip():
+            mix[agent.strip()] = float(weight or 1)
+    return mix
+
+
+def _fake_env(args: argparse.Namespace) -> Dict[str, str]:
+    return {
+        "A2A_LLM_BACKEND": "fake",
+        "A2A_LLM_CACHE": "off",
+        "A2A_TASK_STORE": "off",
+        # The pool of log bodies repeats, so diagnosis reuse would skip most LLM calls
+        "A2A_FINGERPRINT": "off",
+        "A2A_FAKE_LLM_LATENCY": args.latency,
+        "A2A_FAKE_LLM_TOKENS_PER_S": args.tokens_per_s,
+        "A2A_FAKE_LLM_TOKENS": args.output_tokens,
+        "A2A_FAKE_LLM_ESCALATE": str(args.escalate),
+        "A2A_FAKE_LLM_SEED": str(args.seed),
+        "PYTHONWARNINGS": "ignore",
+    }
+
+
+def _build_tasks(cell: Dict[str, Any]):
+    from bench_rule_engine import synthetic_log
+
+    from app.core.a2a_models import Task, TaskInput
+
+    rng = random.Random(cell["seed"])
+    mix = cell["mix"]
+    agents, weights = list(mix), list(mix.values())
+    # A small pool of distinct bodies; the task id line keeps every log (and LLM prompt) unique
+    pool = [
+        synthetic_log(cell["log_kb"] * 1024, cameras=50, seed=cell["seed"] + i)
+        for i in range(min(cell["tasks"], 8))
+    ]
+    tasks = []
+    for i in range(cell["tasks"]):
+        logs = f"{pool[i % len(pool)]}\n[bench] task {i} seed {cell['seed']}"
+        agent = rng.choices(agents, weights)[0]
+        tasks.append(Task(id=f"e2e-{i}", agent_id=agent, input=TaskInput(logs=logs)))
+    return tasks
+
+
+async def _drive(cell: Dict[str, Any]) -> Dict[str, Any]:
+    from app.orchestrator import executor
+    from app.orchestrator.workflow import RunOutcome
+
+    tasks = _build_tasks(cell)
+    stages: Dict[str, List[float]] = {"card": [], "task": []}
+    statuses: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(cell["concurrency"])
+
+    async def one(task) -> None:
+        outcome = RunOutcome()
+        async with semaphore:
+            started = time.perf_counter()
+            async for event in executor.execute_async(task, outcome, verbosity="summary"):
+                data = event.data or {}
+                if event.type == "agent.started" and "card_ms" in data:
+                    stages["card"].append(data["card_ms"])
+                elif event.type == "agent.completed" and "duration_ms" in data:
+                    stages.setdefault(data.get("agent_id", "?"), []).append(data["duration_ms"])
+            stages["task"].append((time.perf_counter() - started) * 1000)
+        status = outcome.result.status if outcome.result is not None else "none"
+        statuses[status] = statuses.get(status, 0) + 1
+
+    # One warm-up task so imports, connection setup and card fetches are not measured
+    await one(tasks[0].model_copy(update={"id": "e2e-warmup"}))
+    stages = {"card": [], "task": []}
+    statuses.clear()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(task) for task in tasks))
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "throughput_tps": round(len(tasks) / elapsed, 2),
+        "statuses": statuses,
+        "stages": {name: _summary(values) for name, values in stages.items() if values},
+    }
+
+
+def _child(cell: Dict[str, Any]) -> None:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    result = asyncio.run(_drive(cell))
+    result["client_peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    print(json.dumps(result))
+
+
+def _start_servers(args: argparse.Namespace) -> Dict[str, subprocess.Popen]:
+    env = dict(os.environ)
+    env.update(_fake_env(args))
+    env["A2A_SERVER_CONCURRENCY"] = str(args.server_concurrency)
+    env["A2A_SERVER_QUEUE"] = str(args.server_queue)
+    servers = {}
+    for offset, agent in enumerate(AGENTS):
+        cmd = [
+            sys.executable, "-m", "uvicorn", "app.server.agent_server:app",
+            "--port", str(args.port + offset), "--log-level", "warning",
+        ]
+        servers[agent] = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+    return servers
+
+
+def _wait_ready(args: argparse.Namespace, timeout_s: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout_s
+    for offset, agent in enumerate(AGENTS):
+        url = f"http://127.0.0.1:{args.port + offset}/agent/{agent}/card"
+        while True:
+            try:
+                if httpx.get(url, timeout=2).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"agent server for {agent} did not start")
+            time.sleep(0.2)
+
+
+def _run_cell(cell: Dict[str, Any], registry_path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.update(_fake_env(args))
+    env["A2A_AGENT_REGISTRY"] = registry_path
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(cell)],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark cell failed: {cell}\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True
+        )
+        return out.stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="local,remote")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--tasks", type=int, default=64)
+    parser.add_argument("--log-kb", default="4,256")
+    parser.add_argument("--mix", default="diagnoser=0.8,fixer=0.15,support=0.05")
+    parser.add_argument("--latency", default="lognormal:200,0.4")
+    parser.add_argument("--tokens-per-s", default="0")
+    parser.add_argument("--output-tokens", default="40")
+    parser.add_argument("--escalate", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=9131)
+    parser.add_argument("--server-concurrency", type=int, default=64)
+    parser.add_argument("--server-queue", type=int, default=256)
+    parser.add_argument("--output", default="")
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(json.loads(args.child))
+        return
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    tmpdir = tempfile.mkdtemp(prefix="a2a-e2e-")
+    registries = {
+        "local": os.path.join(tmpdir, "local.json"),
+        "remote": os.path.join(tmpdir, "remote.json"),
+    }
+    with open(registries["local"], "w", encoding="utf-8") as f:
+        json.dump({}, f)
+    with open(registries["remote"], "w", encoding="utf-8") as f:
+        json.dump({a: f"http://127.0.0.1:{args.port + i}" for i, a in enumerate(AGENTS)}, f)
+
+    servers: Dict[str, subprocess.Popen] = {}
+    results = []
+    try:
+        if "remote" in modes:
+            servers = _start_servers(args)
+            _wait_ready(args)
+        for mode in modes:
+            for log_kb in [int(x) for x in args.log_kb.split(",")]:
+                for concurrency in [int(x) for x in args.concurrency.split(",")]:
+                    cell = {
+                        "mode": mode,
+                        "concurrency": concurrency,
+                        "log_kb": log_kb,
+                        "tasks": args.tasks,
+                        "mix": _parse_mix(args.mix),
+                        "seed": args.seed,
+                    }
+                    measured = _run_cell(cell, registries[mode], args)
+                    row = {k: v for k, v in cell.items() if k not in ("mix", "seed")}
+                    row.update(measured)
+                    if mode == "remote":
+                        row["server_peak_rss_mb"] = {
+                            agent: _proc_peak_rss_mb(proc.pid) for agent, proc in servers.items()
+                        }
+                    results.append(row)
+                    print(
+                        f"{mode:6s} c={concurrency:<3d} log={log_kb}KB "
+                        f"{row['throughput_tps']} tasks/s",
+                        file=sys.stderr,
+                    )
+    finally:
+        for proc in servers.values():
+            proc.terminate()
+        for proc in servers.values():
+            proc.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("child", "output")},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
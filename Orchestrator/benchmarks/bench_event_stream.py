@@ -0,0 +1,150 @@
+# Cost of the event stream around a full Diagnoser -> Fixer -> Support run on a multi-MB log,
+# with the fake LLM backend (zero latency, every fix plan escalated to Support). Each cell
+# (verbosity x consumer x task store) runs in its own subprocess and reports CPU seconds and
+# wall time per run, peak RSS and the bytes of event payload the consumer received.
+# Consumers: "drop" ignores events (type and message only), "json" serializes each one as an
+# SSE/websocket bridge would.
+#
+#   python benchmarks/bench_event_stream.py [--log-mb 8] [--runs 3]
+#       [--verbosity full,summary] [--consumers drop,json] [--stores off,sqlite]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _child(cell: Dict[str, Any]) -> None:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_rule_engine import synthetic_log
+
+    from app.core.a2a_models import Task, TaskInput
+    from app.orchestrator import executor
+
+    logs = synthetic_log(cell["log_mb"] * 1024 * 1024, cameras=500, seed=cell["seed"])
+
+    def run(task_id: str) -> Dict[str, int]:
+        task = Task(id=task_id, agent_id="diagnoser", input=TaskInput(logs=logs))
+        counts = {"events": 0, "bytes": 0}
+        gen = executor.execute(task, verbosity=cell["verbosity"])
+        try:
+            while True:
+                event = next(gen)
+                counts["events"] += 1
+                if cell["consumer"] == "json":
+                    counts["bytes"] += len(event.model_dump_json())
+        except StopIteration as stop:
+            # Support ran, so all three agents took part
+            if stop.value is None or "ticket_id" not in stop.value.details:
+                raise RuntimeError(f"run did not reach Support: {stop.value and stop.value.summary}")
+        return counts
+
+    # Warm-up run: imports, rule compilation and the background loop are not measured
+    run("events-warmup")
+    baseline_mb = _peak_rss_mb()
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    counts = {"events": 0, "bytes": 0}
+    for i in range(cell["runs"]):
+        for key, value in run(f"events-{i}").items():
+            counts[key] += value
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    print(
+        json.dumps(
+            {
+                "cpu_s_per_run": round(cpu / cell["runs"], 3),
+                "wall_s_per_run": round(wall / cell["runs"], 3),
+                "events_per_run": counts["events"] // cell["runs"],
+                "event_mb_per_run": round(counts["bytes"] / cell["runs"] / 1e6, 3),
+                "peak_rss_mb": round(_peak_rss_mb(), 1),
+                "rss_growth_mb": round(_peak_rss_mb() - baseline_mb, 1),
+            }
+        )
+    )
+
+
+def _run_cell(cell: Dict[str, Any], tmpdir: str) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "A2A_LLM_BACKEND": "fake",
+            "A2A_LLM_CACHE": "off",
+            "A2A_FAKE_LLM_LATENCY": "0",
+            "A2A_FAKE_LLM_ESCALATE": "1",
+            "A2A_FINGERPRINT": "off",
+            "A2A_TASK_STORE": cell["store"],
+            "A2A_TASK_STORE_PATH": os.path.join(tmpdir, f"tasks-{os.getpid()}-{time.time_ns()}.db"),
+            "A2A_AGENT_REGISTRY": os.path.join(tmpdir, "local.json"),
+            "PYTHONWARNINGS": "ignore",
+        }
+    )
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(cell)],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark cell failed: {cell}\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log-mb", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--verbosity", default="full,summary")
+    parser.add_argument("--consumers", default="drop,json")
+    parser.add_argument("--stores", default="off,sqlite")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(json.loads(args.child))
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix="a2a-events-")
+    with open(os.path.join(tmpdir, "local.json"), "w", encoding="utf-8") as f:
+        json.dump({}, f)
+    results = []
+    for store in args.stores.split(","):
+        for verbosity in args.verbosity.split(","):
+            for consumer in args.consumers.split(","):
+                cell = {
+                    "store": store,
+                    "verbosity": verbosity,
+                    "consumer": consumer,
+                    "log_mb": args.log_mb,
+                    "runs": args.runs,
+                    "seed": args.seed,
+                }
+                row = {k: cell[k] for k in ("store", "verbosity", "consumer")}
+                row.update(_run_cell(cell, tmpdir))
+                results.append(row)
+                print(
+                    f"store={store:6s} {verbosity:7s} {consumer:4s} "
+                    f"{row['cpu_s_per_run']}s cpu/run",
+                    file=sys.stderr,
+                )
+    params = {k: v for k, v in vars(args).items() if k != "child"}
+    print(json.dumps({"params": params, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Peak RSS of a full local Diagnoser -> Fixer -> Support run on a large log, passed either
+# inline (TaskInput.logs) or by reference (TaskInput.log_ref, streamed line by line).
+# Each mode runs in a fresh subprocess so ru_maxrss is not shared.
+#
+#   python benchmarks/bench_large_log.py [--mb 200] [--max-rss-mb 150]
+#
+# Exits non-zero when the by-reference run exceeds --max-rss-mb, so it can gate CI.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _write_log(path: str, mb: float) -> None:
+    sys.path.insert(0, os.path.dirname(__file__))
+    from bench_rule_engine import synthetic_log
+
+    block = synthetic_log(4 * 1024 * 1024, cameras=500)
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < mb * 1024 * 1024:
+            f.write(block + "\n")
+            written += len(block) + 1
+
+
+def _child(mode: str, path: str) -> None:
+    os.environ["A2A_LLM_CACHE"] = "off"
+    os.environ["GEMINI_API_KEY"] = ""
+    from app.core.a2a_models import LogRef, Task, TaskInput
+    from app.orchestrator import executor
+
+    executor.REMOTE_REGISTRY.mapping = {}
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "inline":
+        with open(path, "r", encoding="utf-8") as f:
+            task_input = TaskInput(logs=f.read())
+    else:
+        task_input = TaskInput(log_ref=LogRef(path=path))
+    for _ in executor.execute(Task(id="bench", agent_id="diagnoser", input=task_input)):
+        pass
+    print(
+        json.dumps(
+            {
+                "mode": mode,
+                "seconds": round(time.perf_counter() - start, 2),
+                "baseline_rss_mb": round(baseline, 1),
+                "peak_rss_mb": round(_peak_rss_mb(), 1),
+            }
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=200)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    parser.add_argument("--modes", nargs="+", default=["ref", "inline"])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "large.log")
+        _write_log(path, args.mb)
+        results = []
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, "-W", "ignore", __file__, "--child", mode, path],
+                check=True,
+                capture_output=True,
+                text=True,
+                cwd=tmp,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps({"log_mb": args.mb, "results": results}, indent=2))
+    ref = next((r for r in results if r["mode"] == "ref"), None)
+    if args.max_rss_mb is not None and ref is not None and ref["peak_rss_mb"] > args.max_rss_mb:
+        sys.exit(f"peak RSS {ref['peak_rss_mb']} MB exceeds {args.max_rss_mb} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Per-call overhead of building a GenerativeModel on every call (old path) versus the
+# memoized ModelRegistry. generate_content is replaced by a local fake so only the
+# client setup cost is measured.
+#
+#   python benchmarks/bench_model_registry.py [--calls 2000]
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import google.generativeai as genai  # noqa: E402
+from app.core import gemini  # noqa: E402
+
+
+class _FakeResponse:
+    text = "1. Power-cycle the camera."
+
+
+def _fake_generate_content(self, prompt, **kwargs):
+    return _FakeResponse()
+
+
+def _legacy_get_model(model_name: str, system_instruction: str):
+    # The pre-registry get_gemini_model, reproduced for comparison
+    if gemini.load_dotenv:
+        gemini.load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+def _time_calls(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+    genai.GenerativeModel.generate_content = _fake_generate_content  # type: ignore[assignment]
+    gemini.set_response_cache(None)
+    gemini.MODELS.reset()
+    system = "You are a diagnostics expert for IP cameras."
+
+    def before():
+        _legacy_get_model(gemini.DEFAULT_MODEL, system).generate_content("Logs: rtsp drop")
+
+    def after():
+        gemini.generate_text("Logs: rtsp drop", system, use_cache=False)
+
+    after()  # first call configures and builds the model
+    results = {
+        "calls": args.calls,
+        "before_us_per_call": round(_time_calls(before, args.calls), 2),
+        "after_us_per_call": round(_time_calls(after, args.calls), 2),
+    }
+    results["speedup"] = round(results["before_us_per_call"] / max(results["after_us_per_call"], 1e-9), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Cold-start cost: import time of the executor and of the agent server, measured with
+# `python -X importtime` in fresh processes, plus the time to a first local run with the
+# fake LLM. Each target also lists modules it must not import (the Gemini SDK, agents a
+# process does not serve). Exits non-zero when a median goes over its budget or a forbidden
+# module shows up, so it can gate regressions:
+#
+#   python benchmarks/bench_startup.py [--repeat 5] [--targets executor,agent_server]
+#       [--budget executor=400,agent_server=600] [--top 10]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+_FIRST_RUN = (
+    "from app.core.a2a_models import Task, TaskInput\n"
+    "from app.orchestrator import executor\n"
+    "task = Task(id='startup', agent_id='diagnoser', input=TaskInput(logs='camera-1: RTSP timeout'))\n"
+    "for _ in executor.execute(task, verbosity='summary'):\n"
+    "    pass\n"
+)
+
+# name -> (code, extra env, modules that must not be imported)
+TARGETS: Dict[str, Tuple[str, Dict[str, str], List[str]]] = {
+    "executor": (
+        "import app.orchestrator.executor",
+        {},
+        ["google.generativeai", "app.agents.diagnoser", "app.agents.fixer", "app.agents.support"],
+    ),
+    "agent_server": (
+        "import app.server.agent_server",
+        {"A2A_AGENTS": "diagnoser"},
+        ["google.generativeai", "app.agents.fixer", "app.agents.support"],
+    ),
+    "agent_server_all": ("import app.server.agent_server", {}, ["google.generativeai"]),
+    "first_run": (
+        _FIRST_RUN,
+        {"A2A_LLM_BACKEND": "fake", "A2A_FAKE_LLM_LATENCY": "0"},
+        ["google.generativeai", "app.agents.support"],
+    ),
+}
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    # "import time:  self [us] | cumulative | <indent>name" -> (name, depth, self_us, cum_us)
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        label = name[1:]
+        depth = (len(label) - len(label.lstrip(" "))) // 2
+        rows.append((label.strip(), depth, int(self_us), int(cum_us)))
+    return rows
+
+
+def _measure(name: str, tmpdir: str) -> Dict[str, Any]:
+    code, extra_env, _ = TARGETS[name]
+    env = dict(os.environ)
+    env.update(
+        {
+            "A2A_AGENT_REGISTRY": os.path.join(tmpdir, "local.json"),
+            "A2A_TASK_STORE": "off",
+            "A2A_LLM_CACHE": "off",
+            "PYTHONWARNINGS": "ignore",
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+    )
+    env.update(extra_env)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr[-4000:]}")
+    rows = _parse_importtime(proc.stderr)
+    return {
+        "wall_ms": wall_ms,
+        "import_ms": sum(cum for _, depth, _, cum in rows if depth == 0) / 1000,
+        "rows": rows,
+    }
+
+
+def _parse_budget(spec: str) -> Dict[str, float]:
+    budget = {}
+    for part in spec.split(","):
+        name, _, ms = part.partition("=")
+        if name.strip() and ms:
+            budget[name.strip()] = float(ms)
+    return budget
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--budget", default="", help="name=ms,... on the median import time")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="a2a-startup-")
+    with open(os.path.join(tmpdir, "local.json"), "w", encoding="utf-8") as f:
+        json.dump({}, f)
+    budget = _parse_budget(args.budget)
+    results = []
+    failures = []
+    for name in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        runs = [_measure(name, tmpdir) for _ in range(args.repeat)]
+        # Module list and per-module costs from the fastest run (least scheduler noise)
+        best = min(runs, key=lambda r: r["import_ms"])
+        imported = {label for label, _, _, _ in best["rows"]}
+        forbidden = [m for m in TARGETS[name][2] if m in imported]
+        top = sorted(best["rows"], key=lambda r: r[2], reverse=True)[: args.top]
+        row = {
+            "target": name,
+            "import_ms_median": round(statistics.median(r["import_ms"] for r in runs), 1),
+            "wall_ms_median": round(statistics.median(r["wall_ms"] for r in runs), 1),
+            "modules": len(imported),
+            "forbidden_imported": forbidden,
+            "top_self_ms": {label: round(self_us / 1000, 1) for label, _, self_us, _ in top},
+        }
+        if forbidden:
+            failures.append(f"{name} imports {', '.join(forbidden)}")
+        if name in budget and row["import_ms_median"] > budget[name]:
+            failures.append(f"{name} import {row['import_ms_median']} ms > budget {budget[name]} ms")
+        results.append(row)
+        print(
+            f"{name:17s} import {row['import_ms_median']} ms, wall {row['wall_ms_median']} ms",
+            file=sys.stderr,
+        )
+    print(json.dumps({"params": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Encode/decode time and bytes on the wire for agent payloads: the JSON path used before
+# negotiation (stdlib json, uncompressed) versus the encodings app.core.wire can negotiate.
+# Payloads: a /run request carrying a multi-MB log, and a Support-hop TaskResult whose
+# context carries the diagnosis, issues and fix plan from earlier hops.
+#
+#   python benchmarks/bench_wire_format.py [--mb 1 4 16] [--repeat 5]
+#
+# msgpack / zstd rows appear only when those packages are installed (pip install -e ".[wire]").
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.agents.rules import DEFAULT_RULES, RuleSet  # noqa: E402
+from app.core import wire  # noqa: E402
+from app.core.a2a_models import TaskResult  # noqa: E402
+from bench_rule_engine import synthetic_log  # noqa: E402
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _payloads(mb: float) -> Dict[str, Any]:
+    logs = synthetic_log(int(mb * 1024 * 1024), cameras=200)
+    issues = RuleSet(DEFAULT_RULES).parse(logs)
+    diagnosis = {"summary": "Likely RTSP instability and packet loss. " * 40, "issues": issues}
+    fix_plan = {"baseline": [f"Step {i}: reboot camera-{i} and verify RTSP" for i in range(50)]}
+    context = {"diagnosis": diagnosis, "fix_plan": fix_plan, "logs_excerpt": logs[:200_000]}
+    result = TaskResult(status="ok", summary="Support ticket created", details={"context": context})
+    return {
+        "run_request": {"logs": logs, "context": {"site": "nvr-1"}, "idempotency_key": "t1@abc:diagnose"},
+        "support_result": result.model_dump(),
+    }
+
+
+def _variants() -> List[Dict[str, Any]]:
+    def stdlib_dumps(payload: Any) -> bytes:
+        return json.dumps(payload).encode("utf-8")
+
+    variants = [{"name": "json-stdlib (before)", "media_type": wire.JSON, "encoding": None, "stdlib": True}]
+    media_types = [wire.JSON] + ([wire.MSGPACK] if wire.msgpack is not None else [])
+    codings = [None, "gzip"] + (["zstd"] if wire.zstandard is not None else [])
+    for media_type in media_types:
+        label = "msgpack" if media_type == wire.MSGPACK else ("json-orjson" if wire.orjson else "json")
+        for coding in codings:
+            variants.append(
+                {
+                    "name": label + (f"+{coding}" if coding else ""),
+                    "media_type": media_type,
+                    "encoding": coding,
+                    "stdlib": False,
+                }
+            )
+    for variant in variants:
+        if variant["stdlib"]:
+            variant["encode"] = stdlib_dumps
+            variant["decode"] = json.loads
+        else:
+            media_type, coding = variant["media_type"], variant["encoding"]
+            variant["encode"] = lambda p, m=media_type, c=coding: wire.compress(wire.dumps(p, m), c)
+            variant["decode"] = lambda b, m=media_type, c=coding: wire.decode(b, m, c)
+    return variants
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for mb in args.mb:
+        for payload_name, payload in _payloads(mb).items():
+            baseline_bytes = None
+            for variant in _variants():
+                body = variant["encode"](payload)
+                assert variant["decode"](body) == payload
+                baseline_bytes = baseline_bytes or len(body)
+                results.append(
+                    {
+                        "log_mb": mb,
+                        "payload": payload_name,
+                        "format": variant["name"],
+                        "bytes": len(body),
+                        "vs_before": round(len(body) / baseline_bytes, 3),
+                        "encode_ms": round(_best_of(lambda: variant["encode"](payload), args.repeat) * 1000, 2),
+                        "decode_ms": round(_best_of(lambda: variant["decode"](body), args.repeat) * 1000, 2),
+                    }
+                )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Load test for the agent server with the fake LLM backend: starts uvicorn in a subprocess,
+# then drives POST /agent/<agent>/run at increasing client concurrency and reports
+# throughput, p50/p99 latency and how many requests were shed with 429.
+#
+#   python benchmarks/load_agent_server.py [--levels 1,8,32,128] [--requests 200]
+#       [--workers 1] [--latency-ms 200] [--server-concurrency 8] [--server-queue 32]
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _start_server(args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "A2A_LLM_BACKEND": "fake",
+            "A2A_LLM_CACHE": "off",
+            # Diagnosis reuse would answer repeated templates without the LLM
+            "A2A_FINGERPRINT": "off",
+            "A2A_FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+            "A2A_SERVER_CONCURRENCY": str(args.server_concurrency),
+            "A2A_SERVER_QUEUE": str(args.server_queue),
+            "PYTHONWARNINGS": "ignore",
+        }
+    )
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.server.agent_server:app",
+        "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+
+
+async def _wait_ready(base_url: str, timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/agent/diagnoser/card")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("agent server did not start")
+
+
+async def _run_level(base_url: str, agent: str, concurrency: int, requests: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+
+        async def worker() -> None:
+            for i in counter:
+                # Unique logs so nothing is served from a cache (the fingerprint index is off)
+                body = {"logs": f"2024-01-01 00:00:00 camera cam-{i}: heartbeat {concurrency}-{i}"}
+                start = time.perf_counter()
+                resp = await client.post(f"/agent/{agent}/run", json=body)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                if resp.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": statuses.get(200, 0),
+        "rejected_429": statuses.get(429, 0),
+        "other_errors": sum(n for code, n in statuses.items() if code not in (200, 429)),
+        "throughput_rps": round(statuses.get(200, 0) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def _main(args: argparse.Namespace) -> List[Dict[str, float]]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    await _wait_ready(base_url)
+    results = []
+    for level in [int(x) for x in args.levels.split(",")]:
+        results.append(await _run_level(base_url, args.agent, level, max(args.requests, level)))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--agent", default="diagnoser")
+    parser.add_argument("--port", type=int, default=9101)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--server-concurrency", type=int, default=8)
+    parser.add_argument("--server-queue", type=int, default=32)
+    args = parser.parse_args()
+
+    server = _start_server(args)
+    try:
+        results = asyncio.run(_main(args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    print(json.dumps({"workers": args.workers, "latency_ms": args.latency_ms, "levels": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()